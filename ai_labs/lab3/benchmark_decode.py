@@ -0,0 +1,90 @@
+import os
+import csv
+import time
+import argparse
+import numpy as np
+from config import *
+from data_utils import list_image_files
+from inference import decode_image, list_input_images, predict_images, get_class_names
+from model_registry import get_registry, default_model_paths
+
+DECODE_MODES = {'full': False, 'draft': True}
+
+def decode_latency(paths, draft, target_size=(IMG_SIZE, IMG_SIZE)):
+    """Median single-threaded time in milliseconds to decode and resize one image."""
+    for path in paths[:3]:
+        decode_image(path, target_size, draft)  # Warm up (file cache)
+
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        decode_image(path, target_size, draft)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+def pixel_difference(paths, target_size=(IMG_SIZE, IMG_SIZE)):
+    """Mean absolute difference (0-255 scale) between the draft and the full decode of the same images."""
+    diffs = [
+        np.abs(np.asarray(decode_image(path, target_size, True), dtype=np.float32)
+               - np.asarray(decode_image(path, target_size, False), dtype=np.float32)).mean()
+        for path in paths
+    ]
+    return float(np.mean(diffs))
+
+def test_accuracy(model, paths, classes, class_indices, draft):
+    """Accuracy of a model on labelled images decoded with or without draft mode."""
+    class_names = get_class_names(class_indices)
+    labels = dict(zip(paths, (class_names[idx] for idx in classes)))
+    results = list(predict_images(model, paths, class_indices, top_k=1, draft=draft))
+    return sum(result['prediction'] == labels[result['path']] for result in results) / len(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the full and draft-mode (DCT-scaled) JPEG decode paths')
+    parser.add_argument('--model', choices=list(default_model_paths()), default='transfer',
+                        help='Model whose test accuracy is compared across the decode paths')
+    parser.add_argument('--input-dir', type=str,
+                        help='Time unlabelled images from this directory instead of the test split (no accuracy)')
+    parser.add_argument('--timed-images', type=int, default=200,
+                        help='Images timed per decode path')
+    args = parser.parse_args()
+
+    if args.input_dir is not None:
+        paths, classes, class_indices = list_input_images(args.input_dir), None, None
+    else:
+        paths, classes, class_indices = list_image_files(os.path.join(BASE_DIR, "test"))
+    if not paths:
+        print("Error: No images found.")
+        return
+    timed = paths[:args.timed_images]
+    model = get_registry().get(args.model) if classes is not None else None
+
+    rows = []
+    for mode, draft in DECODE_MODES.items():
+        print(f"\nBenchmarking {mode} decode...")
+        row = {'decode': mode, 'decode_ms_per_image': round(decode_latency(timed, draft), 3)}
+        if model is not None:
+            row['accuracy'] = round(test_accuracy(model, paths, classes, class_indices, draft), 4)
+        rows.append(row)
+
+    full = rows[0]
+    for row in rows:
+        row['speedup'] = round(full['decode_ms_per_image'] / row['decode_ms_per_image'], 2)
+        if model is not None:
+            row['accuracy_delta'] = round(row['accuracy'] - full['accuracy'], 4)
+    difference = pixel_difference(timed)
+
+    print(f"\n--- Decode Paths ({len(timed)} images timed"
+          + (f", {len(paths)} test images, model {args.model}" if model is not None else "") + ") ---")
+    for row in rows:
+        print(", ".join(f"{key}={value}" for key, value in row.items()))
+    print(f"Mean absolute pixel difference, draft vs full: {difference:.2f} / 255")
+
+    output_path = os.path.join(RESULTS_DIR, "decode_benchmark.csv")
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[-1].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Results saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
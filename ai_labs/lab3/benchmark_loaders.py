@@ -0,0 +1,56 @@
+import os
+import time
+import argparse
+from config import *
+from data_utils import create_image_data_generators, create_tf_datasets
+
+def measure_throughput(loader, num_batches):
+    """Pull batches from a loader and return the number of images per second."""
+    if hasattr(loader, 'reset'):
+        batches = loader
+    else:
+        batches = iter(loader.repeat())
+
+    # Warm up (thread pools, first file reads)
+    next(batches)
+
+    images = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        x_batch, _ = next(batches)
+        images += len(x_batch)
+    elapsed = time.perf_counter() - start
+
+    return images / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ImageDataGenerator against the tf.data loader')
+    parser.add_argument('--batches', type=int, default=20,
+                        help='Number of batches to time per split')
+    args = parser.parse_args()
+
+    train_dir = os.path.join(BASE_DIR, "train")
+    val_dir = os.path.join(BASE_DIR, "validation")
+    test_dir = os.path.join(BASE_DIR, "test")
+
+    loaders = {
+        'generator': create_image_data_generators(train_dir, val_dir, test_dir),
+        'tf_data': create_tf_datasets(train_dir, val_dir, test_dir),
+    }
+
+    results = {}
+    for name, (train_loader, val_loader, _) in loaders.items():
+        print(f"\nBenchmarking {name} loader...")
+        results[name] = {
+            'train': measure_throughput(train_loader, args.batches),
+            'validation': measure_throughput(val_loader, args.batches),
+        }
+
+    print("\n--- Loader Throughput (images/sec) ---")
+    for split in ('train', 'validation'):
+        baseline = results['generator'][split]
+        fast = results['tf_data'][split]
+        print(f"{split}: generator={baseline:.1f}, tf_data={fast:.1f}, speedup={fast / baseline:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+from tensorflow.keras.callbacks import Callback
+from config import *
+from dataset_state import prepared_settings
+
+class StepTimer(Callback):
+    """Record the wall time of every training step."""
+    def on_train_begin(self, logs=None):
+        self.step_times = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step_times.append(time.perf_counter() - self.start)
+
+def run_profile(profile, model_type, epochs, loader):
+    """Train one model under a profile and return its step time and accuracy."""
+    # Precision and thread pools are process-wide, so this runs in its own process
+    from training_utils import apply_training_profile
+    from data_utils import create_data_generators
+    from model_utils import create_custom_cnn_model, create_transfer_learning_model
+
+    jit_compile = apply_training_profile(profile)
+
+    train_dir = os.path.join(BASE_DIR, "train")
+    val_dir = os.path.join(BASE_DIR, "validation")
+    test_dir = os.path.join(BASE_DIR, "test")
+    train_data, val_data, test_data = create_data_generators(train_dir, val_dir, test_dir, loader=loader)
+
+    input_shape = (IMG_SIZE, IMG_SIZE, 3)
+    num_classes = len(train_data.class_indices)
+    if model_type == "custom":
+        model = create_custom_cnn_model(input_shape, num_classes, jit_compile=jit_compile)
+    else:
+        model, _ = create_transfer_learning_model(input_shape, num_classes, jit_compile=jit_compile)
+
+    timer = StepTimer()
+    model.fit(train_data, epochs=epochs, validation_data=val_data, callbacks=[timer], verbose=2)
+    _, test_accuracy = model.evaluate(test_data, verbose=0)
+
+    # The first steps include tracing / XLA compilation
+    steady_steps = timer.step_times[5:] or timer.step_times
+    return {
+        'profile': profile,
+        'first_step_sec': timer.step_times[0],
+        'median_step_sec': float(np.median(steady_steps)),
+        'test_accuracy': float(test_accuracy),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the float32 and "fast" training profiles')
+    parser.add_argument('--model', choices=['custom', 'transfer'], default='custom',
+                        help='Model to train')
+    parser.add_argument('--epochs', type=int, default=3,
+                        help='Training epochs per profile')
+    parser.add_argument('--loader', choices=['generator', 'tf_data', 'cache', 'tfrecord'], default=prepared_settings()['loader'],
+                        help='Data loader used for both profiles')
+    parser.add_argument('--profile', choices=['default', 'fast'],
+                        help=argparse.SUPPRESS)  # Internal: run a single profile and print its result
+    args = parser.parse_args()
+
+    if args.profile:
+        result = run_profile(args.profile, args.model, args.epochs, args.loader)
+        print("RESULT " + json.dumps(result))
+        return
+
+    results = []
+    for profile in ('default', 'fast'):
+        print(f"\nBenchmarking '{profile}' profile...")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', profile, '--model', args.model,
+             '--epochs', str(args.epochs), '--loader', args.loader],
+            check=True, capture_output=True, text=True
+        ).stdout
+        line = [line for line in output.splitlines() if line.startswith("RESULT ")][-1]
+        results.append(json.loads(line[len("RESULT "):]))
+
+    baseline = results[0]['median_step_sec']
+    print(f"\n--- Training Profiles ({args.model} model, {args.epochs} epochs) ---")
+    for result in results:
+        print(f"{result['profile']}: median step {result['median_step_sec'] * 1000:.1f} ms "
+              f"(first step {result['first_step_sec']:.1f} s), speedup {baseline / result['median_step_sec']:.2f}x, "
+              f"test accuracy {result['test_accuracy']:.4f}")
+
+    with open(os.path.join(RESULTS_DIR, f'training_profiles_{args.model}.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
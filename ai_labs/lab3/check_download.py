@@ -0,0 +1,129 @@
+import os
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from download_utils import download_file
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve server.payload for any path, honouring 'Range: bytes=a-b' unless server.honour_ranges is off.
+
+    Range requests starting at or after server.truncate_from get the headers
+    of the full range but only half of its body before the connection is
+    closed, like a dropped connection.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        payload = self.server.payload
+        range_header = self.headers.get('Range')
+        if not (range_header and self.server.honour_ranges):
+            self._send(200, payload)
+            return
+
+        start, end = range_header.split('=', 1)[1].split('-')
+        start = int(start)
+        end = int(end) if end else len(payload) - 1
+        self.server.range_requests.append((start, end))
+        body = payload[start:end + 1]
+        truncate = self.server.truncate_from is not None and start >= self.server.truncate_from
+        self._send(206, body, {'Content-Range': f'bytes {start}-{end}/{len(payload)}'}, truncate)
+
+    def _send(self, status, body, headers=None, truncate=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        if truncate:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2] if truncate else body)
+        if truncate:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The downloader's probe hangs up mid-body when the whole file is sent
+        pass
+
+def start_server(payload):
+    """Start the stand-in server on a free local port; returns the server and the file URL."""
+    server = StandInServer(('127.0.0.1', 0), RangeHandler)
+    server.payload = payload
+    server.honour_ranges = True
+    server.truncate_from = None
+    server.range_requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/102flowers.tgz"
+
+def check_resume(server, url, workdir, chunk_size):
+    """Interrupt a parallel Range download halfway, then resume it and fetch only the missing chunks."""
+    path = os.path.join(workdir, "resume.bin")
+    md5 = hashlib.md5(server.payload).hexdigest()
+    num_chunks = -(-len(server.payload) // chunk_size)
+
+    server.truncate_from = len(server.payload) // 2
+    try:
+        download_file(url, path, md5=md5, num_workers=4, chunk_size=chunk_size)
+        raise AssertionError("the interrupted download did not fail")
+    except (IOError, OSError) as e:
+        print(f"Interrupted as expected: {type(e).__name__}")
+    assert not os.path.exists(path), "an incomplete download was published"
+    assert os.path.exists(path + ".part.json"), "no chunk state was saved"
+
+    server.truncate_from = None
+    server.range_requests.clear()
+    download_file(url, path, md5=md5, num_workers=4, chunk_size=chunk_size)
+    fetched = [request for request in server.range_requests if request != (0, 0)]  # Minus the probe
+    with open(path, 'rb') as f:
+        assert f.read() == server.payload, "resumed file differs from the payload"
+    assert len(fetched) < num_chunks, f"resume fetched {len(fetched)} of {num_chunks} chunks again"
+    assert not os.path.exists(path + ".part.json"), "chunk state left behind"
+    print(f"Resumed: {len(fetched)} of {num_chunks} chunks fetched after the interruption.")
+
+def check_stream_fallback(server, url, workdir, chunk_size):
+    """Download from a server that ignores Range and always answers 200 with the whole file."""
+    path = os.path.join(workdir, "stream.bin")
+    server.honour_ranges = False
+    try:
+        download_file(url, path, md5=hashlib.md5(server.payload).hexdigest(), num_workers=4, chunk_size=chunk_size)
+    finally:
+        server.honour_ranges = True
+    with open(path, 'rb') as f:
+        assert f.read() == server.payload, "streamed file differs from the payload"
+    assert not os.path.exists(path + ".part.json"), "stream fallback wrote chunk state"
+    print("Stream fallback: downloaded on a single connection.")
+
+def check_md5_mismatch(server, url, workdir, chunk_size):
+    """A digest mismatch must raise and leave neither the file nor its partial data behind."""
+    path = os.path.join(workdir, "mismatch.bin")
+    try:
+        download_file(url, path, md5="0" * 32, num_workers=4, chunk_size=chunk_size)
+        raise AssertionError("the MD5 mismatch was not detected")
+    except ValueError as e:
+        print(f"Mismatch detected: {e}")
+    assert not os.path.exists(path), "a file failing its MD5 was published"
+    assert not os.path.exists(path + ".part"), "partial data of a failed download left behind"
+
+def main():
+    """Check download_utils.download_file against a local HTTP server stand-in."""
+    chunk_size = 64 * 1024
+    payload = os.urandom(16 * chunk_size + 123)  # Uneven last chunk
+    server, url = start_server(payload)
+    checks = [check_resume, check_stream_fallback, check_md5_mismatch]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for check in checks:
+                print(f"\n--- {check.__name__} ---")
+                check(server, url, workdir, chunk_size)
+    finally:
+        server.shutdown()
+    print(f"\nAll {len(checks)} download checks passed.")
+
+if __name__ == "__main__":
+    main()
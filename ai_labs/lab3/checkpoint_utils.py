@@ -0,0 +1,182 @@
+import os
+import json
+import random
+import shutil
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, BackupAndRestore, History
+from tensorflow.keras.models import load_model
+from config import *
+from dataset_state import config_hash
+
+def _state_path():
+    return os.path.join(CHECKPOINT_DIR, "training_state.json")
+
+def _write_json(path, data):
+    """Atomically write a JSON file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def load_training_state():
+    """Load the run state: configuration hash and the histories of completed stages."""
+    if not os.path.exists(_state_path()):
+        return {}
+    with open(_state_path()) as f:
+        return json.load(f)
+
+def clear_training_state():
+    """Delete all checkpoints and stage markers, so the next run starts from scratch."""
+    shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+
+def begin_training_run(run_config):
+    """Keep the checkpoints of an interrupted run with the same configuration, otherwise start over."""
+    state = load_training_state()
+    if state and state.get('config_hash') == config_hash(run_config):
+        done = list(state.get('completed', {}))
+        print(f"Resuming interrupted training run (completed stages: {done or 'none'}).")
+        return
+
+    clear_training_state()
+    _write_json(_state_path(), {'config_hash': config_hash(run_config), 'completed': {}})
+
+def complete_stage(stage, model, history):
+    """Record a finished stage (a model or training phase) with its final weights and history."""
+    weights_path = os.path.join(CHECKPOINT_DIR, f"{stage}_weights.npz")
+    np.savez(weights_path, *model.get_weights())
+
+    state = load_training_state()
+    state.setdefault('completed', {})[stage] = history.history
+    _write_json(_state_path(), state)
+
+def restore_completed_stage(stage, model):
+    """Load the weights of a stage finished by an earlier run and return its History, or None."""
+    completed = load_training_state().get('completed', {})
+    if stage not in completed:
+        return None
+
+    with np.load(os.path.join(CHECKPOINT_DIR, f"{stage}_weights.npz")) as weights:
+        model.set_weights([weights[f"arr_{idx}"] for idx in range(len(weights.files))])
+    print(f"Stage '{stage}' was completed by an earlier run. Restored its weights.")
+
+    history = History()
+    history.history = completed[stage]
+    return history
+
+class EpochState(Callback):
+    """Reseed the RNGs every epoch and persist the history and best-so-far callback state.
+
+    BackupAndRestore restores the weights, optimizer and epoch; this restores
+    what it does not, so a resumed phase continues with the same early-stopping
+    patience, checkpoint threshold and per-epoch random streams. The shuffle
+    order of a generator loader (train_data with reset()) is redrawn after the
+    reseed, so it also depends only on the epoch. The state is
+    written before the backup of the same epoch (see fit_resumable), so after a
+    crash between the two writes it is one epoch ahead and is rolled back to
+    the backup's epoch.
+    """
+    def __init__(self, backup_dir, model_checkpoint, early_stopping, train_data=None):
+        super().__init__()
+        self.train_data = train_data
+        self.path = os.path.join(backup_dir, "epoch_state.json")
+        self.model_checkpoint = model_checkpoint
+        self.early_stopping = early_stopping
+        self.history = {}
+        self.first_epoch = None
+        self.callback_states = {}
+
+    def on_train_begin(self, logs=None):
+        self.history = {}
+        self.first_epoch = None
+        self.callback_states = {}
+
+    def _restore(self, initial_epoch):
+        """Load the state as of the end of the epoch before initial_epoch, where the backup resumes."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+
+        # The fit may start at a later initial_epoch (progressive resizing), recorded as first_epoch
+        self.first_epoch = state['first_epoch']
+        self.history = {key: values[:initial_epoch - self.first_epoch] for key, values in state['history'].items()}
+        self.callback_states = {epoch: callbacks for epoch, callbacks in state['callbacks'].items()
+                                if int(epoch) < initial_epoch}
+
+        callbacks = self.callback_states.get(str(initial_epoch - 1))
+        if callbacks is None:
+            # No epoch of this fit was backed up yet
+            return
+        self.model_checkpoint.best = callbacks['checkpoint_best']
+        self.early_stopping.best = callbacks['best']
+        self.early_stopping.wait = callbacks['wait']
+        self.early_stopping.best_epoch = callbacks['best_epoch']
+        if self.early_stopping.restore_best_weights and os.path.exists(self.model_checkpoint.filepath):
+            self.early_stopping.best_weights = load_model(self.model_checkpoint.filepath).get_weights()
+
+        print(f"Resuming training at epoch {initial_epoch + 1}.")
+
+    def on_epoch_begin(self, epoch, logs=None):
+        # The first epoch is the one BackupAndRestore resumes at (set in its on_train_begin)
+        if self.first_epoch is None:
+            self._restore(epoch)
+
+        # Augmentation draws and the generator's shuffle order depend only on the epoch
+        random.seed(42 + epoch)
+        np.random.seed(42 + epoch)
+        tf.random.set_seed(42 + epoch)
+        if hasattr(self.train_data, 'reset') and self.train_data.shuffle:
+            # The generator drew this epoch's order at the end of the previous one (or, after a
+            # resume, when it was created), from another RNG state; draw it again from this epoch's
+            self.train_data.on_epoch_end()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.first_epoch is None:
+            self.first_epoch = epoch
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+
+        best = self.early_stopping.best
+        self.callback_states[str(epoch)] = {
+            'checkpoint_best': None if self.model_checkpoint.best is None else float(self.model_checkpoint.best),
+            'best': None if best is None else float(best),
+            'wait': self.early_stopping.wait,
+            'best_epoch': self.early_stopping.best_epoch,
+        }
+        # The previous epoch's state is kept for a resume from the previous backup
+        self.callback_states = {key: value for key, value in self.callback_states.items()
+                                if int(key) >= epoch - 1}
+        _write_json(self.path, {
+            'epoch': epoch,
+            'first_epoch': self.first_epoch,
+            'history': self.history,
+            'callbacks': self.callback_states,
+        })
+
+def fit_resumable(model, stage, train_data, model_checkpoint, early_stopping, **fit_kwargs):
+    """model.fit with a full-state backup after every epoch and automatic resume.
+
+    The returned History covers all epochs of the stage, including those run
+    before a restart. A resumed run continues at the start of the epoch after
+    the last backup.
+    """
+    if CHECKPOINT_FREQ != "epoch":
+        # A mid-epoch backup would resume at batch 0 of its epoch and train the batches before it twice
+        raise ValueError(f"CHECKPOINT_FREQ must be \"epoch\", got {CHECKPOINT_FREQ!r}")
+
+    backup_dir = os.path.join(CHECKPOINT_DIR, stage)
+    epoch_state = EpochState(backup_dir, model_checkpoint, early_stopping, train_data)
+    # Callbacks run in list order: the epoch state is written after the checkpoint and
+    # early-stopping updates it records, and before the backup of the same epoch
+    callbacks = [
+        model_checkpoint,
+        early_stopping,
+        epoch_state,
+        BackupAndRestore(backup_dir, save_freq="epoch"),
+    ]
+
+    history = model.fit(train_data, callbacks=callbacks, **fit_kwargs)
+    history.history = epoch_state.history
+    return history
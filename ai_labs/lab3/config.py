@@ -13,11 +13,53 @@ IMG_SIZE = 224
 BATCH_SIZE = 32
 EPOCHS = 20
 NUM_CLASSES = 10  # We'll use top 10 classes with most images
+VALIDATION_SPLIT = 0.15  # Fraction of each selected class used for validation
+TEST_SPLIT = 0.15  # Fraction of each selected class used for testing
+DATA_LOADER = "generator"  # "generator" (ImageDataGenerator), "tf_data" (parallel tf.data pipeline) or "cache" (pre-decoded memmaps) or "tfrecord" (sharded TFRecords)
+AUGMENT_IN_MODEL = False  # Run augmentation as preprocessing layers inside the models instead of in the loaders
+GENERATE_REPORTS = True  # Save plots from prepare_data.py / train_models.py (disable with --no-report)
 DATASET_URL = "https://www.robots.ox.ac.uk/~vgg/data/flowers/102/102flowers.tgz"
 LABELS_URL = "https://www.robots.ox.ac.uk/~vgg/data/flowers/102/imagelabels.mat"
+DATASET_MD5 = "52808999861908f626f3c1f4e79d11fa"  # Published MD5 of 102flowers.tgz (the digest torchvision's Flowers102 checks)
+LABELS_MD5 = "e0620be6f572b9609742df49c70aed4d"  # Published MD5 of imagelabels.mat
+DATASET_SHA256 = None  # Optional SHA-256 of 102flowers.tgz, checked in addition to DATASET_MD5
+TRUST_STORED_CHECKSUM = False  # Override: verify the downloads against the SHA-256 stored after their first download instead
+DOWNLOAD_WORKERS = 8  # Parallel HTTP Range connections for the dataset download
+STREAM_EXTRACT = True  # Extract only the selected classes from the archive in one streaming pass
 BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset")
 MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")  # Pre-decoded uint8 image arrays per split
+TFRECORD_DIR = os.path.join(BASE_DIR, "tfrecords")  # Sharded TFRecord export of the splits
+TFRECORD_SHARDS = 8  # Number of TFRecord shards per split
+DATASET_LAYOUT = "copy"  # "copy", "link" (hard links, symlink fallback) or "manifest" (CSV index, no duplicated files)
+DATASET_MANIFEST = os.path.join(BASE_DIR, "flowers_dataset.csv")  # Selected images (manifest layout)
+SPLIT_MANIFEST = os.path.join(BASE_DIR, "splits.csv")  # Train/validation/test assignment (manifest layout)
+PREPARE_STATE = os.path.join(BASE_DIR, "prepare_state.json")  # Config hashes and per-file digests of the prepared data
+INDEX_TABLE = os.path.join(BASE_DIR, "index_table.npy")  # Selected images with their label and split
+PROGRESSIVE_RESIZING = False  # Train at increasing resolutions (PROGRESSIVE_SIZES), from the pre-decoded cache
+PROGRESSIVE_SIZES = [128, 160, IMG_SIZE]  # Epochs are split evenly; the last size takes the remainder
+CUSTOM_MODEL = "baseline"  # "baseline" (Flatten + Dense head), a model_utils.LIGHTWEIGHT_VARIANTS name, or "budget"
+FLOP_BUDGET_MFLOPS = None  # With CUSTOM_MODEL = "budget": maximum forward-pass MFLOPs per image
+LATENCY_BUDGET_MS = None  # With CUSTOM_MODEL = "budget": maximum measured CPU latency per image (ms)
+EXPORT_DIR = os.path.join(MODEL_DIR, "export")  # TFLite/ONNX artifacts written by export_models.py
+REPRESENTATIVE_SAMPLES = 200  # Train images used to calibrate full-int8 quantization
+DRAFT_DECODE = False  # inference.py/serve.py: decode JPEGs at 1/2-1/8 scale in the decoder (PIL draft mode); averages pixels unlike training
+SERVE_MAX_BATCH = 32  # serve.py: largest micro-batch of coalesced requests
+SERVE_MAX_LATENCY_MS = 10  # serve.py: longest a request waits for its micro-batch to fill
+MODEL_CACHE_MB = 1024  # model_registry: RAM budget for models kept loaded (least recently used are evicted)
+TRAINING_PROFILE = "default"  # "default" (float32) or "fast" (mixed_bfloat16 where supported, XLA JIT, tuned thread pools)
+INTRA_OP_THREADS = 0  # Threads per op in the "fast" profile (0 = one per CPU core)
+INTER_OP_THREADS = 2  # Ops run concurrently in the "fast" profile
+TRAINING_WORKERS = 1  # Local data-parallel worker processes (--workers); the global batch and learning rates scale with it
+RESUME_TRAINING = True  # Full-state checkpoints with automatic resume of an interrupted train_models.py run
+CHECKPOINT_DIR = os.path.join(MODEL_DIR, "checkpoints")  # Backups and completed-stage markers of the current run
+CHECKPOINT_FREQ = "epoch"  # Backup frequency; only "epoch" (a resume restarts the interrupted epoch from its first batch)
+FEATURE_CACHE = False  # Train transfer phase 1 on cached frozen-backbone features instead of full forward passes
+FEATURE_CACHE_PASSES = 5  # Augmented passes over the training set stored in the feature cache
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, "features")  # Cached pooled MobileNetV2 features (and prefix activations)
+ACTIVATION_CACHE = False  # Fine-tune (transfer phase 2) on cached activations of the frozen part of MobileNetV2
+PREFIX_CUT_LAYER = "block_14_add"  # Last frozen MobileNetV2 layer; its output is cached and the rest is trained
 
 # Create necessary directories
 os.makedirs(BASE_DIR, exist_ok=True)
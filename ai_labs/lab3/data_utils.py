@@ -1,145 +1,356 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-import requests
+from tensorflow.keras.preprocessing.image import ImageDataGenerator, load_img, img_to_array
 import tarfile
 import shutil
-from pathlib import Path
-import random
+import json
+import csv
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from config import *
+from download_utils import download_file, verify_file
+from model_utils import build_augmentation_layers
+from dataset_state import (
+    load_prepare_state, save_prepare_state, cached_file_hash, record_file_hash,
+    list_files, remove_empty_dirs, sync_files, split_fingerprint, prepared_settings, save_prepared_settings
+)
 
-def download_and_extract_dataset():
-    """Download and extract the Oxford 102 Flowers dataset."""
-    print("Downloading and extracting the dataset...")
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff')
+SPLIT_NAMES = ('train', 'validation', 'test')
+INDEX_TABLE_DTYPE = np.dtype([('image_index', np.int32), ('label', np.int32), ('split', np.int8)])
+
+def download_dataset():
+    """Download the Oxford 102 Flowers archive and labels."""
+    print("Downloading the dataset...")
     
     # Download flower images
     flowers_path = os.path.join(BASE_DIR, "102flowers.tgz")
-    if not os.path.exists(flowers_path):
+    checksums = dict(sha256=DATASET_SHA256, md5=DATASET_MD5, trust_stored=TRUST_STORED_CHECKSUM)
+    if not os.path.exists(flowers_path) or not verify_file(flowers_path, **checksums):
         print("Downloading flower images...")
-        response = requests.get(DATASET_URL, stream=True)
-        with open(flowers_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                f.write(chunk)
+        download_file(DATASET_URL, flowers_path, num_workers=DOWNLOAD_WORKERS, **checksums)
+    
+    # Download labels
+    labels_path = os.path.join(BASE_DIR, "imagelabels.mat")
+    checksums = dict(md5=LABELS_MD5, trust_stored=TRUST_STORED_CHECKSUM)
+    if not os.path.exists(labels_path) or not verify_file(labels_path, **checksums):
+        print("Downloading labels...")
+        download_file(LABELS_URL, labels_path, **checksums)
+    
+    return flowers_path, labels_path
+
+def extract_dataset(flowers_path):
+    """Extract every image of the flowers archive.
     
-    # Extract flower images
+    Completion is recorded in PREPARE_STATE only after the whole archive was
+    extracted, so an interrupted extraction is redone by the next run.
+    """
     extract_dir = os.path.join(BASE_DIR, "extracted")
-    if not os.path.exists(extract_dir):
+    if not load_prepare_state().get('full_extract_complete') or not os.path.isdir(extract_dir):
         os.makedirs(extract_dir, exist_ok=True)
         print("Extracting flower images...")
         with tarfile.open(flowers_path) as tar:
             tar.extractall(path=extract_dir)
-    
-    # Download labels
-    labels_path = os.path.join(BASE_DIR, "imagelabels.mat")
-    if not os.path.exists(labels_path):
-        print("Downloading labels...")
-        response = requests.get(LABELS_URL)
-        with open(labels_path, "wb") as f:
-            f.write(response.content)
-    
+        
+        state = load_prepare_state()
+        state['full_extract_complete'] = True
+        save_prepare_state(state)
+    return extract_dir
+
+def download_and_extract_dataset():
+    """Download and extract the Oxford 102 Flowers dataset."""
+    print("Downloading and extracting the dataset...")
+    flowers_path, labels_path = download_dataset()
+    extract_dir = extract_dataset(flowers_path)
     print("Dataset download and extraction complete.")
     return extract_dir, labels_path
 
-def prepare_dataset(extracted_dir, labels_path):
-    """Prepare the dataset by organizing images into class folders."""
-    print("Preparing the dataset...")
-    
-    # Load labels
+def load_labels(labels_path):
+    """Load the per-image class labels (image_00001.jpg is labels[0])."""
     from scipy.io import loadmat
-    labels = loadmat(labels_path)['labels'][0]
+    return loadmat(labels_path)['labels'][0]
+
+def select_top_classes(labels, num_classes=NUM_CLASSES):
+    """Return the ids of the num_classes classes with the most images (ties go to the class seen first)."""
+    class_ids, first_index, counts = np.unique(labels, return_index=True, return_counts=True)
+    order = np.lexsort((first_index, -counts))[:num_classes]
+    return class_ids[order]
+
+def build_index_table(labels, num_classes=NUM_CLASSES, seed=42):
+    """Select the top classes and assign every selected image to a split.
+    
+    Each class is split on its own, by a permutation seeded with its label, so
+    a class's assignment never depends on which other classes are selected.
+    Returns a structured array with one row per selected image: its 1-based
+    image index, class label and split code (an index into SPLIT_NAMES).
+    """
+    labels = np.asarray(labels)
+    top_class_ids = select_top_classes(labels, num_classes)
+    print(f"Selected top {num_classes} classes: {top_class_ids.tolist()}")
+    
+    selected = np.flatnonzero(np.isin(labels, top_class_ids))
+    selected_labels = labels[selected]
+    
+    # Group the selected images by class, in image order within a class
+    order = np.lexsort((selected, selected_labels))
+    class_ids, starts, counts = np.unique(selected_labels[order], return_index=True, return_counts=True)
+    
+    # Split into train, validation and test (70/15/15 by default) within each class;
+    # the first ranks of a class's permutation go to test, the next to validation
+    split = np.zeros(len(selected), dtype=np.int8)
+    for class_id, start, count in zip(class_ids.tolist(), starts.tolist(), counts.tolist()):
+        members = order[start:start + count]
+        ranks = np.random.RandomState(seed + class_id).permutation(count)
+        num_test = int(round(count * TEST_SPLIT))
+        num_val = int(round(count * VALIDATION_SPLIT))
+        split[members[ranks[:num_test]]] = 2
+        split[members[ranks[num_test:num_test + num_val]]] = 1
+    
+    table = np.empty(len(selected), dtype=INDEX_TABLE_DTYPE)
+    table['image_index'] = selected + 1
+    table['label'] = selected_labels
+    table['split'] = split
+    return table
+
+def save_index_table(table):
+    """Atomically write the index table next to the dataset."""
+    tmp_path = INDEX_TABLE + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, table)
+    os.replace(tmp_path, INDEX_TABLE)
+
+def load_index_table():
+    """Load the index table written by the preparation stage."""
+    return np.load(INDEX_TABLE)
+
+def _table_paths(table):
+    """Relative class_<label>/image_<idx>.jpg path of every row of the index table."""
+    return [
+        os.path.join(f"class_{label}", f"image_{idx:05d}.jpg")
+        for idx, label in zip(table['image_index'].tolist(), table['label'].tolist())
+    ]
+
+def extract_selected_images(flowers_path, labels_path, layout=DATASET_LAYOUT):
+    """Extract only the images of the top classes straight into their class folders.
     
-    # Count occurrences of each class to find the top N classes
-    class_counts = {}
-    for label in labels:
-        if label not in class_counts:
-            class_counts[label] = 0
-        class_counts[label] += 1
+    The archive is read once as a stream; members of unselected classes are
+    skipped without being written to disk. Images already extracted by an
+    earlier run (verified by their recorded digest) are kept, so changing
+    NUM_CLASSES only extracts the added classes and deletes the dropped ones.
+    """
+    print("Extracting selected classes from the archive...")
     
-    # Get top N classes with most images
-    top_classes = sorted(class_counts.items(), key=lambda x: x[1], reverse=True)[:NUM_CLASSES]
-    top_class_ids = [cls[0] for cls in top_classes]
+    table = build_index_table(load_labels(labels_path))
+    save_index_table(table)
     
-    print(f"Selected top {NUM_CLASSES} classes: {top_class_ids}")
+    state = load_prepare_state()
+    hash_cache = state.setdefault('hash_cache', {})
+    recorded = state.get('extracted', {})
     
-    # Create directories for dataset organization
     dataset_dir = os.path.join(BASE_DIR, "flowers_dataset")
-    if os.path.exists(dataset_dir):
-        print("Dataset already organized. Skipping preparation.")
-        return dataset_dir
+    targets = {rel: os.path.basename(rel) for rel in _table_paths(table)}
+    
+    # Drop images of classes that are no longer selected
+    existing = list_files(dataset_dir)
+    dropped = existing - targets.keys()
+    for rel in dropped:
+        os.remove(os.path.join(dataset_dir, rel))
+    remove_empty_dirs(dataset_dir)
+    if dropped:
+        print(f"Removed {len(dropped)} images of deselected classes.")
+    
+    missing = {
+        targets[rel]: rel for rel in targets
+        if rel not in existing
+        or recorded.get(rel) != cached_file_hash(os.path.join(dataset_dir, rel), hash_cache)
+    }
+    
+    if missing:
+        print(f"Extracting {len(missing)} of {len(targets)} selected images...")
+        with tarfile.open(flowers_path, mode='r|gz') as tar:
+            for member in tar:
+                fname = os.path.basename(member.name)
+                if not member.isfile() or fname not in missing:
+                    continue
+                
+                rel = missing[fname]
+                target_file = os.path.join(dataset_dir, rel)
+                os.makedirs(os.path.dirname(target_file), exist_ok=True)
+                
+                # Write to a temporary name so a crash never leaves a truncated image behind
+                digest = hashlib.sha256()
+                with tar.extractfile(member) as src, open(target_file + ".tmp", 'wb') as dst:
+                    for block in iter(lambda: src.read(1024 * 1024), b''):
+                        digest.update(block)
+                        dst.write(block)
+                os.replace(target_file + ".tmp", target_file)
+                
+                recorded[rel] = digest.hexdigest()
+                record_file_hash(target_file, recorded[rel], hash_cache)
+    else:
+        print("Extracted images are up to date.")
+    
+    state['extracted'] = {rel: recorded[rel] for rel in targets if rel in recorded}
+    save_prepare_state(state)
+    print("Selective extraction complete.")
+    
+    # Manifest layout: the extracted folder is the only copy; the index points into it
+    if layout == "manifest":
+        rows = [
+            {'filepath': os.path.join(dataset_dir, rel), 'class': os.path.dirname(rel)}
+            for rel in sorted(targets)
+            if os.path.exists(os.path.join(dataset_dir, rel))
+        ]
+        write_manifest(DATASET_MANIFEST, rows)
+        return DATASET_MANIFEST
+    
+    return dataset_dir
+
+def prepare_dataset(extracted_dir, labels_path, layout=DATASET_LAYOUT):
+    """Prepare the dataset by organizing images into class folders (or a manifest).
     
-    os.makedirs(dataset_dir, exist_ok=True)
+    The class folders are reconciled against the current selection, so only
+    added, removed or changed images are copied or deleted.
+    """
+    print("Preparing the dataset...")
+    
+    # Load labels and compute the class selection and split assignment
+    table = build_index_table(load_labels(labels_path))
+    save_index_table(table)
     
     # Source directory with all images
     source_dir = os.path.join(extracted_dir, "jpg")
+    desired = {
+        rel: os.path.join(source_dir, os.path.basename(rel))
+        for rel in _table_paths(table)
+        if os.path.exists(os.path.join(source_dir, os.path.basename(rel)))
+    }
     
-    # Create class directories and copy images
-    for cls_id in top_class_ids:
-        class_dir = os.path.join(dataset_dir, f"class_{cls_id}")
-        os.makedirs(class_dir, exist_ok=True)
-    
-    # Copy images to respective class folders
-    for idx, label in enumerate(labels, 1):
-        if label in top_class_ids:
-            source_file = os.path.join(source_dir, f"image_{idx:05d}.jpg")
-            target_file = os.path.join(dataset_dir, f"class_{label}", f"image_{idx:05d}.jpg")
-            if os.path.exists(source_file) and not os.path.exists(target_file):
-                shutil.copy(source_file, target_file)
+    # Manifest layout: record the selection in a CSV index instead of creating files
+    dataset_dir = os.path.join(BASE_DIR, "flowers_dataset")
+    if layout == "manifest":
+        rows = [
+            {'filepath': desired[rel], 'class': os.path.dirname(rel)}
+            for rel in sorted(desired)
+        ]
+        write_manifest(DATASET_MANIFEST, rows)
+        
+        # Class folders of an earlier copy/link run would only duplicate the extracted images
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+        
+        print("Dataset preparation complete.")
+        return DATASET_MANIFEST
+    
+    # Copy or link images to respective class folders
+    state = load_prepare_state()
+    sync_files(dataset_dir, desired, layout, state.setdefault('hash_cache', {}))
+    save_prepare_state(state)
     
     print("Dataset preparation complete.")
     return dataset_dir
 
-def split_dataset(dataset_dir):
-    """Split the dataset into train, validation, and test sets."""
+def write_manifest(path, rows):
+    """Write a list of dict rows to a CSV manifest."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ['filepath', 'class'])
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+def read_manifest(path):
+    """Read a CSV manifest into a list of dict rows."""
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def _dataset_sources(dataset_dir):
+    """Map each image file name to its path, from class folders or a dataset manifest."""
+    if os.path.isfile(dataset_dir):
+        return {os.path.basename(row['filepath']): row['filepath'] for row in read_manifest(dataset_dir)}
+    return {os.path.basename(rel): os.path.join(dataset_dir, rel) for rel in list_files(dataset_dir)}
+
+def split_dataset(dataset_dir, layout=DATASET_LAYOUT):
+    """Split the dataset into train, validation, and test sets.
+    
+    The assignment comes from the index table computed during preparation. The
+    split folders are reconciled with it, so changing the split ratios only
+    moves the images whose split changed. In manifest layout no files are
+    written; the splits are recorded in SPLIT_MANIFEST and the loaders read the
+    original images through it.
+    """
     print("Splitting dataset into train, validation, and test sets...")
     
-    from sklearn.model_selection import train_test_split
-    
-    train_dir = os.path.join(BASE_DIR, "train")
-    val_dir = os.path.join(BASE_DIR, "validation")
-    test_dir = os.path.join(BASE_DIR, "test")
-    
-    # Check if splits already exist
-    if os.path.exists(train_dir) and os.path.exists(val_dir) and os.path.exists(test_dir):
-        print("Dataset splits already exist. Skipping split.")
-        return train_dir, val_dir, test_dir
-    
-    # Create directories
-    for dir_path in [train_dir, val_dir, test_dir]:
-        os.makedirs(dir_path, exist_ok=True)
-        # Create class subdirectories
-        for class_dir in os.listdir(dataset_dir):
-            if os.path.isdir(os.path.join(dataset_dir, class_dir)):
-                os.makedirs(os.path.join(dir_path, class_dir), exist_ok=True)
-    
-    # Split data for each class
-    for class_dir in os.listdir(dataset_dir):
-        class_path = os.path.join(dataset_dir, class_dir)
-        if os.path.isdir(class_path):
-            images = [img for img in os.listdir(class_path) if img.endswith('.jpg')]
-            
-            # Split into train (70%), validation (15%), and test (15%)
-            train_imgs, temp_imgs = train_test_split(images, test_size=0.3, random_state=42)
-            val_imgs, test_imgs = train_test_split(temp_imgs, test_size=0.5, random_state=42)
-            
-            # Copy images to respective directories
-            for img in train_imgs:
-                shutil.copy(os.path.join(class_path, img), os.path.join(train_dir, class_dir, img))
-            for img in val_imgs:
-                shutil.copy(os.path.join(class_path, img), os.path.join(val_dir, class_dir, img))
-            for img in test_imgs:
-                shutil.copy(os.path.join(class_path, img), os.path.join(test_dir, class_dir, img))
+    split_dirs = [os.path.join(BASE_DIR, split_name) for split_name in SPLIT_NAMES]
+    state = load_prepare_state()
+    
+    table = load_index_table()
+    sources = _dataset_sources(dataset_dir)
+    
+    desired = {split_dir: {} for split_dir in split_dirs}
+    manifest_rows = []
+    for rel, split_code in zip(_table_paths(table), table['split'].tolist()):
+        source_file = sources.get(os.path.basename(rel))
+        if source_file is None:
+            continue
+        desired[split_dirs[split_code]][rel] = source_file
+        manifest_rows.append({'filepath': source_file, 'class': os.path.dirname(rel), 'split': SPLIT_NAMES[split_code]})
+    
+    if layout == "manifest":
+        write_manifest(SPLIT_MANIFEST, manifest_rows)
+        # Split folders of an earlier copy/link run would be stale duplicates
+        for split_dir in split_dirs:
+            shutil.rmtree(split_dir, ignore_errors=True)
+    else:
+        # Copy or link images to respective directories
+        hash_cache = state.setdefault('hash_cache', {})
+        for split_dir, split_files in desired.items():
+            sync_files(split_dir, split_files, layout, hash_cache)
+    
+    save_prepare_state(state)
     
     print("Dataset split complete.")
+    train_dir, val_dir, test_dir = split_dirs
     return train_dir, val_dir, test_dir
 
-def create_data_generators(train_dir, val_dir, test_dir):
-    """Create data generators with augmentation for training."""
+def create_data_generators(train_dir, val_dir, test_dir, loader=DATA_LOADER, augment=not AUGMENT_IN_MODEL,
+                           report_plots=False, batch_size=BATCH_SIZE, shard=None):
+    """Create data generators with augmentation for training.
+    
+    Pass augment=False when the model applies augmentation itself, and
+    report_plots=True to save a sample of augmented images. With
+    shard=(num_shards, index), the training and validation loaders only read
+    one data-parallel worker's part of their splits (see shard_files); the
+    test loader always covers the whole split.
+    """
     print("Creating data generators...")
     
+    if loader == "generator":
+        train_generator, validation_generator, test_generator = create_image_data_generators(train_dir, val_dir, test_dir, augment, batch_size, shard)
+    elif loader == "tf_data":
+        train_generator, validation_generator, test_generator = create_tf_datasets(train_dir, val_dir, test_dir, batch_size=batch_size, augment=augment, shard=shard)
+    elif loader == "cache":
+        train_generator, validation_generator, test_generator = create_cached_datasets(train_dir, val_dir, test_dir, batch_size=batch_size, augment=augment, shard=shard)
+    elif loader == "tfrecord":
+        train_generator, validation_generator, test_generator = create_tfrecord_datasets(train_dir, val_dir, test_dir, batch_size=batch_size, augment=augment, shard=shard)
+    else:
+        raise ValueError(f"Unknown data loader: {loader}")
+    
+    # Visualize some augmented images
+    if report_plots:
+        import reporting
+        reporting.visualize_augmented_images(train_generator)
+    
+    return train_generator, validation_generator, test_generator
+
+def create_image_data_generators(train_dir, val_dir, test_dir, augment=True, batch_size=BATCH_SIZE, shard=None):
+    """Create ImageDataGenerator iterators for the train, validation and test splits."""
+    # Validation and test data generators (only rescaling)
+    val_test_datagen = ImageDataGenerator(rescale=1./255)
+    
     # Training data generator with augmentation
-    train_datagen = ImageDataGenerator(
+    train_datagen = val_test_datagen if not augment else ImageDataGenerator(
         rescale=1./255,
         rotation_range=20,
         width_shift_range=0.2,
@@ -152,66 +363,498 @@ def create_data_generators(train_dir, val_dir, test_dir):
         fill_mode='nearest'
     )
     
-    # Validation and test data generators (only rescaling)
-    val_test_datagen = ImageDataGenerator(rescale=1./255)
-    
     # Create generators
-    train_generator = train_datagen.flow_from_directory(
-        train_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=True
-    )
+    train_generator = flow_from_split(train_datagen, train_dir, shuffle=True, batch_size=batch_size, shard=shard)
+    validation_generator = flow_from_split(val_test_datagen, val_dir, shuffle=False, batch_size=batch_size, shard=shard)
+    test_generator = flow_from_split(val_test_datagen, test_dir, shuffle=False, batch_size=batch_size)
     
-    validation_generator = val_test_datagen.flow_from_directory(
-        val_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=False
+    return train_generator, validation_generator, test_generator
+
+def list_image_files(directory):
+    """List image paths and labels of a split in the same order as flow_from_directory.
+    
+    In manifest layout (as prepared, see prepared_settings) the split is read
+    from SPLIT_MANIFEST instead of its folder.
+    """
+    if prepared_settings()['layout'] == "manifest":
+        return _list_manifest_files(os.path.basename(os.path.normpath(directory)))
+    
+    class_names = sorted(
+        name for name in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, name))
     )
+    class_indices = {name: idx for idx, name in enumerate(class_names)}
+    
+    filepaths = []
+    classes = []
+    for class_name in class_names:
+        class_path = os.path.join(directory, class_name)
+        for fname in sorted(os.listdir(class_path)):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                filepaths.append(os.path.join(class_path, fname))
+                classes.append(class_indices[class_name])
+    
+    return filepaths, np.array(classes, dtype=np.int32), class_indices
+
+def shard_files(filepaths, classes, shard):
+    """Keep every num_shards-th image of a split, starting at index, for shard=(num_shards, index).
     
-    test_generator = val_test_datagen.flow_from_directory(
-        test_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=False
+    The shards of one split are disjoint and differ in size by at most one image.
+    """
+    num_shards, index = shard
+    return list(filepaths)[index::num_shards], np.asarray(classes)[index::num_shards]
+
+def _list_manifest_files(split_name):
+    """List image paths and labels of a split recorded in SPLIT_MANIFEST."""
+    rows = [row for row in read_manifest(SPLIT_MANIFEST) if row['split'] == split_name]
+    rows.sort(key=lambda row: (row['class'], os.path.basename(row['filepath'])))
+    class_indices = {name: idx for idx, name in enumerate(sorted({row['class'] for row in rows}))}
+    filepaths = [row['filepath'] for row in rows]
+    classes = np.array([class_indices[row['class']] for row in rows], dtype=np.int32)
+    return filepaths, classes, class_indices
+
+def flow_from_split(datagen, split_dir, shuffle, batch_size=BATCH_SIZE, shard=None):
+    """Create a DirectoryIterator-compatible iterator for a split folder or manifest split.
+    
+    With shard=(num_shards, index), only that shard of the split (see shard_files) is read.
+    """
+    if shard is None and prepared_settings()['layout'] != "manifest":
+        return datagen.flow_from_directory(
+            split_dir,
+            target_size=(IMG_SIZE, IMG_SIZE),
+            batch_size=batch_size,
+            class_mode='categorical',
+            shuffle=shuffle
+        )
+    
+    filepaths, classes, class_indices = list_image_files(split_dir)
+    if shard is not None:
+        filepaths, classes = shard_files(filepaths, classes, shard)
+    return ManifestIterator(datagen, filepaths, classes, class_indices, batch_size=batch_size, shuffle=shuffle)
+
+class ManifestIterator(tf.keras.utils.PyDataset):
+    """DirectoryIterator-compatible batches of an ImageDataGenerator over an explicit list of image files.
+
+    Used for the manifest layout, where the split images are not arranged in
+    class folders. Images are loaded with nearest-neighbour resizing and then
+    randomly transformed and standardized by the generator, as in
+    flow_from_directory.
+    """
+    def __init__(self, datagen, filepaths, classes, class_indices, img_size=IMG_SIZE, batch_size=BATCH_SIZE,
+                 shuffle=False, **kwargs):
+        super().__init__(**kwargs)
+        self.datagen = datagen
+        self.filepaths = list(filepaths)
+        self.filenames = self.filepaths
+        self.classes = np.asarray(classes, dtype=np.int32)
+        self.class_indices = class_indices
+        self.samples = len(self.filepaths)
+        self.img_size = img_size
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.batch_index = 0
+        self.on_epoch_end()
+        print(f"Found {self.samples} images belonging to {len(class_indices)} classes.")
+
+    def __len__(self):
+        return -(-self.samples // self.batch_size)
+
+    def __getitem__(self, idx):
+        batch_indices = self.index_array[idx * self.batch_size:(idx + 1) * self.batch_size]
+        x_batch = np.empty((len(batch_indices), self.img_size, self.img_size, 3), dtype=np.float32)
+        for slot, sample in enumerate(batch_indices):
+            x = img_to_array(load_img(self.filepaths[sample], target_size=(self.img_size, self.img_size),
+                                      interpolation='nearest'))
+            x = self.datagen.apply_transform(x, self.datagen.get_random_transform(x.shape))
+            x_batch[slot] = self.datagen.standardize(x)
+        y_batch = np.zeros((len(batch_indices), len(self.class_indices)), dtype=np.float32)
+        y_batch[np.arange(len(batch_indices)), self.classes[batch_indices]] = 1.0
+        return x_batch, y_batch
+
+    def on_epoch_end(self):
+        self.index_array = np.random.permutation(self.samples) if self.shuffle else np.arange(self.samples)
+
+    def reset(self):
+        self.batch_index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # Endless, like DirectoryIterator: a new shuffle after each epoch
+        if self.batch_index == len(self):
+            self.on_epoch_end()
+            self.batch_index = 0
+        self.batch_index += 1
+        return self[self.batch_index - 1]
+
+def _load_image(path, img_size):
+    """Decode and resize a single image file to a uint8 tensor."""
+    return _decode_image(tf.io.read_file(path), img_size)
+
+def _decode_image(encoded, img_size):
+    """Decode and resize encoded image bytes to a uint8 tensor."""
+    image = tf.io.decode_image(encoded, channels=3, expand_animations=False)
+    image = tf.image.resize(image, (img_size, img_size), method='nearest')
+    return tf.cast(image, tf.uint8)
+
+def build_tf_dataset(filepaths, classes, class_indices, img_size=IMG_SIZE, batch_size=BATCH_SIZE, training=False,
+                     augment=True):
+    """Build a batched, prefetched tf.data pipeline over a list of image files.
+    
+    The returned dataset carries the `class_indices`, `classes` and `samples`
+    attributes of a DirectoryIterator so evaluation code works with either loader.
+    """
+    num_classes = len(class_indices)
+    
+    dataset = tf.data.Dataset.from_tensor_slices((filepaths, classes))
+    if training:
+        dataset = dataset.shuffle(len(filepaths), seed=42, reshuffle_each_iteration=True)
+    
+    # Decode in parallel; order only matters for the unshuffled splits
+    dataset = dataset.map(
+        lambda path, label: (_load_image(path, img_size), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training
     )
+    dataset = dataset.batch(batch_size)
     
-    # Visualize some augmented images
-    visualize_augmented_images(train_generator)
-    
-    return train_generator, validation_generator, test_generator
+    return _finish_dataset(dataset, classes, class_indices, training, augment)
 
-def visualize_augmented_images(train_generator):
-    """Visualize sample original and augmented images."""
-    plt.figure(figsize=(16, 8))
-    
-    # Get a batch of images and their labels
-    x_batch, y_batch = next(train_generator)
+def _finish_dataset(dataset, classes, class_indices, training, augment=True):
+    """Normalize (and, for training, augment) uint8 batches, prefetch, and attach the generator attributes."""
+    dataset = dataset.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=AUTOTUNE)
+    if training and augment:
+        augmentation = build_augmentation_layers()
+        dataset = dataset.map(
+            lambda x, y: (augmentation(x, training=True), y),
+            num_parallel_calls=AUTOTUNE
+        )
+    
+    dataset = dataset.prefetch(AUTOTUNE)
+    
+    dataset.class_indices = class_indices
+    dataset.classes = classes
+    dataset.samples = len(classes)
+    return dataset
+
+def create_tf_dataset(directory, img_size=IMG_SIZE, batch_size=BATCH_SIZE, training=False, augment=True, shard=None):
+    """Create a tf.data pipeline for a single split directory (or one shard of it, see shard_files)."""
+    filepaths, classes, class_indices = list_image_files(directory)
+    if shard is not None:
+        filepaths, classes = shard_files(filepaths, classes, shard)
+    print(f"Found {len(filepaths)} images belonging to {len(class_indices)} classes.")
+    return build_tf_dataset(filepaths, classes, class_indices, img_size, batch_size, training, augment)
+
+def create_tf_datasets(train_dir, val_dir, test_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE, augment=True,
+                       shard=None):
+    """Create tf.data pipelines for the train, validation and test splits."""
+    train_dataset = create_tf_dataset(train_dir, img_size, batch_size, training=True, augment=augment, shard=shard)
+    validation_dataset = create_tf_dataset(val_dir, img_size, batch_size, shard=shard)
+    test_dataset = create_tf_dataset(test_dir, img_size, batch_size)
+    return train_dataset, validation_dataset, test_dataset
+
+def _cache_paths(split_name):
+    """Return the image, label and metadata file paths of a cached split."""
+    return (
+        os.path.join(CACHE_DIR, f"{split_name}_images.npy"),
+        os.path.join(CACHE_DIR, f"{split_name}_labels.npy"),
+        os.path.join(CACHE_DIR, f"{split_name}_meta.json"),
+    )
+
+def _is_cache_current(split_name, fingerprint, img_size):
+    """Check that a cached split exists and was built from the split currently on disk."""
+    images_path, labels_path, meta_path = _cache_paths(split_name)
+    if not all(os.path.exists(path) for path in (images_path, labels_path, meta_path)):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get('fingerprint') == fingerprint and meta['img_size'] == img_size
+
+def cache_split(split_dir, img_size=IMG_SIZE, num_workers=8):
+    """Decode and resize a split once into an N x H x W x 3 uint8 memmap plus a labels array."""
+    split_name = os.path.basename(os.path.normpath(split_dir))
+    images_path, labels_path, meta_path = _cache_paths(split_name)
+    filepaths, classes, class_indices = list_image_files(split_dir)
+    fingerprint = split_fingerprint(filepaths, classes)
+    
+    if _is_cache_current(split_name, fingerprint, img_size):
+        print(f"Cache for '{split_name}' is up to date. Skipping.")
+        return images_path, labels_path
+    
+    print(f"Caching {len(filepaths)} '{split_name}' images at {img_size}x{img_size}...")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    
+    # Write to temporary files first so an interrupted run never leaves a valid-looking cache
+    tmp_images_path = images_path + ".tmp"
+    images = np.lib.format.open_memmap(
+        tmp_images_path, mode='w+', dtype=np.uint8,
+        shape=(len(filepaths), img_size, img_size, 3)
+    )
     
-    for i in range(min(8, len(x_batch))):
-        plt.subplot(2, 4, i+1)
-        plt.imshow(x_batch[i])
-        class_idx = np.argmax(y_batch[i])
-        class_name = list(train_generator.class_indices.keys())[class_idx]
-        plt.title(f'Class: {class_name}')
-        plt.axis('off')
+    def decode(item):
+        idx, path = item
+        img = load_img(path, target_size=(img_size, img_size))
+        images[idx] = np.asarray(img, dtype=np.uint8)
+    
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(decode, enumerate(filepaths)))
+    
+    images.flush()
+    del images
+    os.replace(tmp_images_path, images_path)
+    np.save(labels_path, classes)
+    with open(meta_path, 'w') as f:
+        json.dump({
+            'class_indices': class_indices,
+            'num_images': len(filepaths),
+            'img_size': img_size,
+            'fingerprint': fingerprint,
+        }, f)
+    
+    return images_path, labels_path
+
+def cache_splits(train_dir, val_dir, test_dir, img_size=IMG_SIZE):
+    """Build the pre-decoded cache for all three splits."""
+    print("Caching pre-decoded splits...")
+    for split_dir in (train_dir, val_dir, test_dir):
+        cache_split(split_dir, img_size)
+    print("Split caching complete.")
+
+def load_cached_split(split_name):
+    """Open a cached split; the images are memory-mapped, not read into RAM."""
+    images_path, labels_path, meta_path = _cache_paths(split_name)
+    images = np.load(images_path, mmap_mode='r')
+    labels = np.load(labels_path)
+    with open(meta_path) as f:
+        class_indices = json.load(f)['class_indices']
+    return images, labels, class_indices
+
+def build_cached_dataset(images, labels, class_indices, batch_size=BATCH_SIZE, training=False, augment=True,
+                         img_size=None, shard=None):
+    """Build a tf.data pipeline that slices batches straight out of a memory-mapped cache.
+    
+    With an img_size different from the cached size, batches are resized on the fly,
+    so runs at several resolutions share one cache. With shard=(num_shards, index),
+    only the images of that shard (see shard_files) are read.
+    """
+    num_classes = len(class_indices)
+    one_hot_labels = tf.one_hot(labels, num_classes)
+    image_shape = images.shape[1:]
+    
+    def gather(idx):
+        # Sorted indices keep reads sequential within the memmap
+        return images[np.sort(idx)]
+    
+    def load_batch(idx):
+        idx = tf.sort(idx)
+        x = tf.numpy_function(gather, [idx], tf.uint8)
+        x.set_shape((None,) + image_shape)
+        return x, tf.gather(one_hot_labels, idx)
+    
+    dataset = tf.data.Dataset.range(len(labels))
+    if shard is not None:
+        dataset = dataset.shard(*shard)
+        labels = labels[shard[1]::shard[0]]
+    if training:
+        dataset = dataset.shuffle(len(labels), seed=42, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(load_batch, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    if img_size is not None and img_size != image_shape[0]:
+        dataset = dataset.map(
+            lambda x, y: (tf.cast(tf.image.resize(x, (img_size, img_size), antialias=True), tf.uint8), y),
+            num_parallel_calls=AUTOTUNE
+        )
+    
+    return _finish_dataset(dataset, labels, class_indices, training, augment)
+
+def create_cached_dataset(split_dir, batch_size=BATCH_SIZE, training=False, augment=True, img_size=None, shard=None):
+    """Create a loader for a split from its pre-decoded cache, building the cache if needed."""
+    cache_split(split_dir)
+    images, labels, class_indices = load_cached_split(os.path.basename(os.path.normpath(split_dir)))
+    print(f"Loaded {len(labels)} cached images belonging to {len(class_indices)} classes.")
+    return build_cached_dataset(images, labels, class_indices, batch_size, training, augment, img_size, shard)
+
+def create_cached_datasets(train_dir, val_dir, test_dir, batch_size=BATCH_SIZE, augment=True, shard=None):
+    """Create cache-backed loaders for the train, validation and test splits."""
+    train_dataset = create_cached_dataset(train_dir, batch_size, training=True, augment=augment, shard=shard)
+    validation_dataset = create_cached_dataset(val_dir, batch_size, shard=shard)
+    test_dataset = create_cached_dataset(test_dir, batch_size)
+    return train_dataset, validation_dataset, test_dataset
+
+def _tfrecord_paths(split_name, num_shards):
+    """Return the shard file paths and metadata path of a TFRecord split."""
+    shard_paths = [
+        os.path.join(TFRECORD_DIR, f"{split_name}-{shard:05d}-of-{num_shards:05d}.tfrecord")
+        for shard in range(num_shards)
+    ]
+    return shard_paths, os.path.join(TFRECORD_DIR, f"{split_name}_meta.json")
+
+def export_split_tfrecords(split_dir, num_shards=TFRECORD_SHARDS):
+    """Pack a split into sharded TFRecord files holding the encoded image bytes and label.
+    
+    Records are written round-robin across shards, so reading the shards with a
+    deterministic interleave restores the original (flow_from_directory) order.
+    """
+    split_name = os.path.basename(os.path.normpath(split_dir))
+    shard_paths, meta_path = _tfrecord_paths(split_name, num_shards)
+    filepaths, classes, class_indices = list_image_files(split_dir)
+    fingerprint = split_fingerprint(filepaths, classes)
+    
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') == fingerprint and meta['num_shards'] == num_shards:
+            print(f"TFRecords for '{split_name}' are up to date. Skipping.")
+            return shard_paths
+    
+    print(f"Writing {len(filepaths)} '{split_name}' images to {num_shards} TFRecord shards...")
+    os.makedirs(TFRECORD_DIR, exist_ok=True)
+    
+    writers = [tf.io.TFRecordWriter(path) for path in shard_paths]
+    for idx, (path, label) in enumerate(zip(filepaths, classes)):
+        with open(path, 'rb') as f:
+            encoded = f.read()
+        example = tf.train.Example(features=tf.train.Features(feature={
+            'image/encoded': tf.train.Feature(bytes_list=tf.train.BytesList(value=[encoded])),
+            'image/label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+        }))
+        writers[idx % num_shards].write(example.SerializeToString())
+    for writer in writers:
+        writer.close()
+    
+    # Metadata is written last; its presence marks a complete export
+    with open(meta_path, 'w') as f:
+        json.dump({
+            'class_indices': class_indices,
+            'classes': classes.tolist(),
+            'num_images': len(filepaths),
+            'num_shards': num_shards,
+            'fingerprint': fingerprint,
+        }, f)
+    
+    return shard_paths
+
+def export_tfrecords(train_dir, val_dir, test_dir, num_shards=TFRECORD_SHARDS):
+    """Export all three splits as sharded TFRecords."""
+    print("Exporting splits to TFRecords...")
+    for split_dir in (train_dir, val_dir, test_dir):
+        export_split_tfrecords(split_dir, num_shards)
+    print("TFRecord export complete.")
+
+def _parse_example(serialized, img_size, num_classes):
+    """Parse one serialized Example into a decoded image and one-hot label."""
+    features = tf.io.parse_single_example(serialized, {
+        'image/encoded': tf.io.FixedLenFeature([], tf.string),
+        'image/label': tf.io.FixedLenFeature([], tf.int64),
+    })
+    image = _decode_image(features['image/encoded'], img_size)
+    return image, tf.one_hot(features['image/label'], num_classes)
+
+def create_tfrecord_dataset(split_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE, training=False, augment=True,
+                            num_shards=TFRECORD_SHARDS, shuffle_buffer=2048, shard=None):
+    """Create a loader that reads a split's TFRecord shards in parallel, exporting them if needed.
+    
+    With shard=(num_shards, index), only every num_shards-th record is decoded (see shard_files).
+    """
+    export_split_tfrecords(split_dir, num_shards)
+    split_name = os.path.basename(os.path.normpath(split_dir))
+    shard_paths, meta_path = _tfrecord_paths(split_name, num_shards)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    class_indices = meta['class_indices']
+    classes = np.array(meta['classes'], dtype=np.int32)
+    
+    files = tf.data.Dataset.from_tensor_slices(shard_paths)
+    if training:
+        files = files.shuffle(len(shard_paths), seed=42, reshuffle_each_iteration=True)
+    
+    # Read all shards concurrently; a deterministic round-robin keeps evaluation order stable
+    # and gives every data-parallel worker the same record order to shard
+    dataset = files.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=len(shard_paths),
+        block_length=1,
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training or shard is not None
+    )
+    if shard is not None:
+        dataset = dataset.shard(*shard)
+        classes = classes[shard[1]::shard[0]]
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer, seed=42, reshuffle_each_iteration=True)
+    
+    dataset = dataset.map(
+        lambda serialized: _parse_example(serialized, img_size, len(class_indices)),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training
+    )
+    dataset = dataset.batch(batch_size)
     
-    plt.suptitle('Sample Augmented Images')
-    plt.savefig(os.path.join(RESULTS_DIR, 'augmented_images.png'))
-    plt.close()
+    print(f"Reading {meta['num_images']} images belonging to {len(class_indices)} classes from {len(shard_paths)} shards.")
+    return _finish_dataset(dataset, classes, class_indices, training, augment)
 
-def prepare_data():
-    """Main function to prepare the data."""
+def create_tfrecord_datasets(train_dir, val_dir, test_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE, augment=True,
+                             shard=None):
+    """Create TFRecord-backed loaders for the train, validation and test splits."""
+    train_dataset = create_tfrecord_dataset(train_dir, img_size, batch_size, training=True, augment=augment,
+                                            shard=shard)
+    validation_dataset = create_tfrecord_dataset(val_dir, img_size, batch_size, shard=shard)
+    test_dataset = create_tfrecord_dataset(test_dir, img_size, batch_size)
+    return train_dataset, validation_dataset, test_dataset
+
+def get_sample_batch(data):
+    """Return the first (images, labels) batch of a generator or tf.data loader as NumPy arrays."""
+    if hasattr(data, 'reset'):
+        data.reset()
+        return next(data)
+    
+    x_batch, y_batch = next(iter(data))
+    return x_batch.numpy(), y_batch.numpy()
+
+def iterate_batches(data):
+    """Yield one epoch of (images, labels) NumPy batches from a generator or tf.data loader."""
+    if hasattr(data, 'reset'):
+        data.reset()
+        for _ in range(len(data)):
+            yield next(data)
+        return
+    
+    for x_batch, y_batch in data:
+        yield x_batch.numpy(), y_batch.numpy()
+
+def prepare_data(loader=None, num_shards=TFRECORD_SHARDS, layout=None, stream_extract=None,
+                 augment=not AUGMENT_IN_MODEL, report_plots=False, batch_size=BATCH_SIZE):
+    """Main function to prepare the data.
+    
+    loader, layout and stream_extract default to the settings the dataset was
+    last prepared with (see prepared_settings).
+    """
+    settings = prepared_settings()
+    loader = settings['loader'] if loader is None else loader
+    layout = settings['layout'] if layout is None else layout
+    stream_extract = settings['stream_extract'] if stream_extract is None else stream_extract
+    
     # Download and prepare dataset
-    extracted_dir, labels_path = download_and_extract_dataset()
-    dataset_dir = prepare_dataset(extracted_dir, labels_path)
-    train_dir, val_dir, test_dir = split_dataset(dataset_dir)
+    if stream_extract:
+        flowers_path, labels_path = download_dataset()
+        dataset_dir = extract_selected_images(flowers_path, labels_path, layout)
+    else:
+        extracted_dir, labels_path = download_and_extract_dataset()
+        dataset_dir = prepare_dataset(extracted_dir, labels_path, layout)
+    train_dir, val_dir, test_dir = split_dataset(dataset_dir, layout)
+    # The loaders read the splits the way they were just laid out
+    save_prepared_settings(layout=layout, stream_extract=stream_extract)
+    
+    # One-time cache/export of every split for the cache- and TFRecord-backed loaders
+    if loader == "cache":
+        cache_splits(train_dir, val_dir, test_dir)
+    elif loader == "tfrecord":
+        export_tfrecords(train_dir, val_dir, test_dir, num_shards)
     
     # Create data generators
-    train_generator, validation_generator, test_generator = create_data_generators(train_dir, val_dir, test_dir)
+    train_generator, validation_generator, test_generator = create_data_generators(
+        train_dir, val_dir, test_dir, loader, augment, report_plots, batch_size
+    )
     
     return train_generator, validation_generator, test_generator
@@ -0,0 +1,141 @@
+import os
+import json
+import shutil
+import hashlib
+from config import *
+from download_utils import sha256_file
+
+def config_hash(config):
+    """Stable short hash of a JSON-serializable configuration."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def load_prepare_state():
+    """Load the data-preparation state (config hashes and per-file digests)."""
+    if not os.path.exists(PREPARE_STATE):
+        return {}
+    with open(PREPARE_STATE) as f:
+        return json.load(f)
+
+def save_prepare_state(state):
+    """Atomically write the data-preparation state, dropping digests of deleted files."""
+    hash_cache = state.get('hash_cache', {})
+    state['hash_cache'] = {path: entry for path, entry in hash_cache.items() if os.path.exists(path)}
+
+    tmp_path = PREPARE_STATE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, PREPARE_STATE)
+
+def _default_settings():
+    return {'layout': DATASET_LAYOUT, 'stream_extract': STREAM_EXTRACT, 'loader': DATA_LOADER}
+
+def prepared_settings():
+    """Layout, extraction mode and loader the dataset was prepared with.
+
+    Choices made with prepare_data.py flags are stored in PREPARE_STATE, so the
+    training and inference scripts (and later preparation runs) keep using
+    them. A config.py default edited since then takes precedence again.
+    """
+    stored = load_prepare_state().get('settings', {})
+    settings = {}
+    for key, default in _default_settings().items():
+        value, stored_default = stored.get(key, (default, default))
+        settings[key] = value if stored_default == default else default
+    return settings
+
+def save_prepared_settings(**settings):
+    """Record preparation settings together with the config.py defaults they were chosen over."""
+    defaults = _default_settings()
+    state = load_prepare_state()
+    stored = state.setdefault('settings', {})
+    for key, value in settings.items():
+        stored[key] = [value, defaults[key]]
+    save_prepare_state(state)
+
+def _stat_key(path):
+    """Cheap change detector for a file: size plus modification time."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def cached_file_hash(path, hash_cache):
+    """SHA-256 of a file, reusing the stored digest while its size and mtime are unchanged."""
+    key = _stat_key(path)
+    entry = hash_cache.get(path)
+    if entry and entry[0] == key:
+        return entry[1]
+
+    digest = sha256_file(path)
+    hash_cache[path] = [key, digest]
+    return digest
+
+def record_file_hash(path, digest, hash_cache):
+    """Store the digest of a file that was just written."""
+    hash_cache[path] = [_stat_key(path), digest]
+
+def split_fingerprint(filepaths, classes):
+    """Hash of a split's file list, labels and file sizes/mtimes, used to detect stale caches."""
+    digest = hashlib.sha256()
+    for path, label in zip(filepaths, classes):
+        digest.update(f"{path}|{int(label)}|{_stat_key(path)}\n".encode())
+    return digest.hexdigest()[:16]
+
+def list_files(root):
+    """Return the relative paths of all files below root."""
+    files = set()
+    if not os.path.isdir(root):
+        return files
+    for dirpath, _, fnames in os.walk(root):
+        for fname in fnames:
+            files.add(os.path.relpath(os.path.join(dirpath, fname), root))
+    return files
+
+def remove_empty_dirs(root):
+    """Delete directories below root that no longer contain any files."""
+    for dirpath, _, _ in sorted(os.walk(root), key=lambda item: len(item[0]), reverse=True):
+        if dirpath != root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+def place_file(source_file, target_file, layout=DATASET_LAYOUT):
+    """Materialize a dataset file by copying it or, in link layout, hard/symbolic linking it."""
+    if layout == "copy":
+        shutil.copy(source_file, target_file)
+        return
+
+    try:
+        os.link(source_file, target_file)
+    except OSError:
+        # Hard links fail across filesystems and on some network mounts
+        os.symlink(os.path.realpath(source_file), target_file)
+
+def sync_files(root, desired, layout, hash_cache):
+    """Make root contain exactly the desired {relative path: source file} set.
+
+    Files whose content already matches their source are left untouched, so
+    only added, removed or changed files cost any I/O.
+    """
+    existing = list_files(root)
+
+    removed = 0
+    for rel in existing - desired.keys():
+        os.remove(os.path.join(root, rel))
+        removed += 1
+
+    added = 0
+    for rel, source_file in desired.items():
+        target_file = os.path.join(root, rel)
+        if rel in existing:
+            if os.path.samefile(source_file, target_file):
+                continue
+            # Link layout also replaces stale copies so no duplicate data is left behind
+            if layout == "copy" and cached_file_hash(target_file, hash_cache) == cached_file_hash(source_file, hash_cache):
+                continue
+            os.remove(target_file)
+
+        os.makedirs(os.path.dirname(target_file), exist_ok=True)
+        place_file(source_file, target_file, layout)
+        added += 1
+
+    remove_empty_dirs(root)
+    print(f"{os.path.basename(root)}: {added} added or updated, {removed} removed, "
+          f"{len(desired) - added} unchanged.")
+    return added, removed
@@ -0,0 +1,162 @@
+import os
+import json
+import socket
+import subprocess
+from itertools import islice
+import tensorflow as tf
+from tensorflow.keras.callbacks import ModelCheckpoint, History, CallbackList
+from config import *
+from data_utils import iterate_batches
+
+def free_ports(count):
+    """Reserve count free localhost ports for the workers' collective ops."""
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        sockets.append(sock)
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+def launch_workers(num_workers, command):
+    """Run command once per local worker, each with its own TF_CONFIG, and return the first failing exit code.
+
+    The workers form one MultiWorkerMirroredStrategy cluster on localhost. Each
+    gets `--worker-index <i>` appended; the chief (worker 0) writes to this
+    console, the others to results/worker_<i>.log. If a worker fails, the rest
+    are stopped, since their collective ops would wait for it forever.
+    """
+    cluster = {'worker': [f"localhost:{port}" for port in free_ports(num_workers)]}
+    processes = []
+    log_files = []
+    for index in range(num_workers):
+        env = dict(os.environ, TF_CONFIG=json.dumps({'cluster': cluster, 'task': {'type': 'worker', 'index': index}}))
+        if index == 0:
+            output = None
+        else:
+            output = open(os.path.join(RESULTS_DIR, f"worker_{index}.log"), 'w')
+            log_files.append(output)
+        processes.append(subprocess.Popen(command + ['--worker-index', str(index)], env=env,
+                                          stdout=output, stderr=subprocess.STDOUT if output else None))
+    print(f"Launched {num_workers} training workers; workers 1 and up log to {RESULTS_DIR}/worker_<i>.log.")
+
+    exit_code = 0
+    try:
+        pending = list(processes)
+        while pending:
+            for process in list(pending):
+                try:
+                    code = process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    continue
+                pending.remove(process)
+                if code != 0 and exit_code == 0:
+                    exit_code = code
+                    print(f"Worker {processes.index(process)} failed (exit code {code}); stopping the others.")
+                    for other in pending:
+                        other.terminate()
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+        for log_file in log_files:
+            log_file.close()
+    return exit_code
+
+def create_worker_strategy():
+    """Join the worker cluster described by TF_CONFIG (see launch_workers)."""
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    print(f"Worker {strategy.cluster_resolver.task_id} of {strategy.num_replicas_in_sync} ready.")
+    return strategy
+
+def is_chief(strategy):
+    """Whether this process is worker 0, the only one that saves models and evaluates."""
+    return strategy.cluster_resolver.task_id == 0
+
+def _batch_sums(y, predictions):
+    """Per-example losses, and (loss sum, correct predictions, examples) of a batch."""
+    per_example_loss = tf.cast(tf.keras.losses.categorical_crossentropy(y, predictions), tf.float32)
+    correct = tf.reduce_sum(tf.cast(tf.equal(tf.argmax(y, axis=-1), tf.argmax(predictions, axis=-1)), tf.float32))
+    return per_example_loss, tf.stack([tf.reduce_sum(per_example_loss), correct, tf.cast(tf.shape(y)[0], tf.float32)])
+
+def fit_distributed(model, strategy, train_data, validation_data, epochs, callbacks=(), batch_size=BATCH_SIZE):
+    """Train a model compiled in strategy.scope() with a custom loop over this worker's data shard.
+
+    Keras 3's fit() cannot run under MultiWorkerMirroredStrategy, so every
+    worker feeds batches of its own shard (data_utils.shard_files) to
+    strategy.run, which all-reduces the gradients. The loss is averaged over
+    the global batch (batch_size per worker), so each step matches one step of
+    a single process with batch_size * workers. All workers run the same number
+    of steps per epoch: that of the smallest shard. Validation sums are added
+    up across the workers' shards, so early stopping decides alike everywhere;
+    ModelCheckpoint callbacks only run on the chief. Returns a History like
+    model.fit.
+    """
+    global_batch_size = batch_size * strategy.num_replicas_in_sync
+    chief = is_chief(strategy)
+    if not chief:
+        callbacks = [callback for callback in callbacks if not isinstance(callback, ModelCheckpoint)]
+    history = History()
+    callback_list = CallbackList(list(callbacks) + [history], model=model)
+
+    @tf.function(reduce_retracing=True)
+    def train_step(x, y):
+        def replica_step(x, y):
+            with tf.GradientTape() as tape:
+                predictions = model(x, training=True)
+                per_example_loss, sums = _batch_sums(y, predictions)
+                loss = tf.nn.compute_average_loss(per_example_loss, global_batch_size=global_batch_size)
+                if model.losses:
+                    loss += tf.nn.scale_regularization_loss(tf.add_n(model.losses))
+            gradients = tape.gradient(loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            return sums
+        return strategy.reduce('SUM', strategy.run(replica_step, args=(x, y)), axis=None)
+
+    # Validation shards may differ by a batch, so the forward passes stay local and only the totals are reduced
+    @tf.function(reduce_retracing=True)
+    def validation_step(x, y):
+        sums = strategy.run(lambda x, y: _batch_sums(y, model(x, training=False))[1], args=(x, y))
+        return strategy.experimental_local_results(sums)[0]
+
+    @tf.function
+    def sum_across_workers(value):
+        return strategy.reduce('SUM', strategy.run(tf.identity, args=(value,)), axis=None)
+
+    # Every worker must run the same number of all-reduce steps
+    local_steps = -(-train_data.samples // batch_size)
+    all_steps = strategy.gather(strategy.run(lambda: tf.constant([local_steps])), axis=0)
+    steps = int(tf.reduce_min(all_steps))
+
+    model.stop_training = False
+    callback_list.on_train_begin()
+    for epoch in range(epochs):
+        if hasattr(train_data, 'reset') and train_data.shuffle:
+            train_data.on_epoch_end()
+        callback_list.on_epoch_begin(epoch)
+
+        train_sums = tf.zeros(3)
+        for x_batch, y_batch in islice(iterate_batches(train_data), steps):
+            train_sums += train_step(x_batch, y_batch)
+        validation_sums = tf.zeros(3)
+        for x_batch, y_batch in iterate_batches(validation_data):
+            validation_sums += validation_step(x_batch, y_batch)
+        validation_sums = sum_across_workers(validation_sums)
+
+        logs = {
+            'loss': float(train_sums[0] / train_sums[2]),
+            'accuracy': float(train_sums[1] / train_sums[2]),
+            'val_loss': float(validation_sums[0] / validation_sums[2]),
+            'val_accuracy': float(validation_sums[1] / validation_sums[2]),
+        }
+        if chief:
+            print(f"Epoch {epoch + 1}/{epochs} ({steps} steps of {global_batch_size}): "
+                  + " - ".join(f"{key}: {value:.4f}" for key, value in logs.items()))
+        callback_list.on_epoch_end(epoch, logs)
+        if model.stop_training:
+            break
+    callback_list.on_train_end()
+
+    return history
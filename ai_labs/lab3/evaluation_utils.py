@@ -1,28 +1,25 @@
-import os
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import classification_report, confusion_matrix
 from config import *
+from data_utils import iterate_batches
+from streaming_metrics import StreamingMetrics
 
-def evaluate_model(model, test_generator, model_name="model"):
-    """Evaluate model and display metrics."""
-    print(f"Evaluating {model_name}...")
+def evaluate_model(model, test_generator, model_name="model", report_plots=False, progress_every=10):
+    """Evaluate model and display metrics; plots are only rendered with report_plots=True.
     
-    # Get predictions
-    predictions = model.predict(test_generator)
-    y_pred = np.argmax(predictions, axis=1)
+    Metrics are accumulated batch by batch (streaming_metrics), so memory does
+    not grow with the test set; a running summary is printed every
+    progress_every batches.
+    """
+    print(f"Evaluating {model_name}...")
     
-    # Get true labels
-    y_true = test_generator.classes
+    # Predict batch by batch, keeping only the running metrics
+    metrics = StreamingMetrics(test_generator.class_indices.keys())
+    for batch_idx, (x_batch, y_batch) in enumerate(iterate_batches(test_generator), start=1):
+        metrics.update(y_batch, model.predict_on_batch(x_batch))
+        if progress_every and batch_idx % progress_every == 0:
+            print(f"  {metrics.summary()}")
     
     # Calculate metrics
-    report = classification_report(
-        y_true, 
-        y_pred, 
-        target_names=list(test_generator.class_indices.keys()),
-        output_dict=True
-    )
+    report = metrics.report()
     
     # Print metrics summary
     print(f"\n{model_name} Evaluation Results:")
@@ -33,60 +30,20 @@ def evaluate_model(model, test_generator, model_name="model"):
     
     print(f"Accuracy: {report['accuracy']:.4f}")
     print(f"Macro Avg F1-Score: {report['macro avg']['f1-score']:.4f}")
+    for k, value in metrics.top_k_accuracy().items():
+        if k > 1:
+            print(f"Top-{k} Accuracy: {value:.4f}")
+    print(f"Expected Calibration Error: {metrics.calibration()['ece']:.4f}")
     
-    # Plot confusion matrix
-    cm = confusion_matrix(y_true, y_pred)
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=list(test_generator.class_indices.keys()),
-                yticklabels=list(test_generator.class_indices.keys()))
-    plt.xlabel('Predicted')
-    plt.ylabel('True')
-    plt.title(f'Confusion Matrix - {model_name}')
-    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_confusion_matrix.png'))
-    plt.close()
-    
-    # Visualize some predictions
-    visualize_predictions(model, test_generator, model_name)
+    # Plot confusion matrix and some predictions
+    if report_plots:
+        import reporting
+        reporting.plot_confusion_matrix(metrics.confusion, list(test_generator.class_indices.keys()), model_name)
+        reporting.visualize_predictions(model, test_generator, model_name)
     
     return report
 
-def visualize_predictions(model, test_generator, model_name):
-    """Visualize model predictions on sample test images."""
-    # Reset generator to start
-    test_generator.reset()
-    
-    # Get a batch of test images
-    x_batch, y_batch = next(test_generator)
-    
-    # Make predictions
-    preds = model.predict(x_batch)
-    
-    # Plot images with predictions
-    plt.figure(figsize=(16, 12))
-    class_names = list(test_generator.class_indices.keys())
-    
-    for i in range(min(12, len(x_batch))):
-        plt.subplot(3, 4, i+1)
-        plt.imshow(x_batch[i])
-        true_class_idx = np.argmax(y_batch[i])
-        pred_class_idx = np.argmax(preds[i])
-        
-        true_class = class_names[true_class_idx]
-        pred_class = class_names[pred_class_idx]
-        confidence = preds[i][pred_class_idx]
-        
-        color = 'green' if true_class_idx == pred_class_idx else 'red'
-        plt.title(f"True: {true_class}\nPred: {pred_class}\nConf: {confidence:.2f}", 
-                  color=color)
-        plt.axis('off')
-    
-    plt.suptitle(f'{model_name} - Predictions', fontsize=16)
-    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_predictions.png'))
-    plt.close()
-
-def compare_models(custom_results, transfer_results):
+def compare_models(custom_results, transfer_results, report_plots=False):
     """Compare performance of custom and transfer learning models."""
     print("Comparing models...")
     
@@ -94,31 +51,9 @@ def compare_models(custom_results, transfer_results):
     accuracy = [custom_results['accuracy'], transfer_results['accuracy']]
     f1_score = [custom_results['macro avg']['f1-score'], transfer_results['macro avg']['f1-score']]
     
-    plt.figure(figsize=(10, 6))
-    
-    x = np.arange(len(models))
-    width = 0.35
-    
-    plt.bar(x - width/2, accuracy, width, label='Accuracy')
-    plt.bar(x + width/2, f1_score, width, label='Macro F1-Score')
-    
-    plt.xlabel('Model')
-    plt.ylabel('Score')
-    plt.title('Model Comparison')
-    plt.xticks(x, models)
-    plt.ylim(0, 1)
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    
-    for i, v in enumerate(accuracy):
-        plt.text(i - width/2, v + 0.02, f'{v:.4f}', ha='center')
-    
-    for i, v in enumerate(f1_score):
-        plt.text(i + width/2, v + 0.02, f'{v:.4f}', ha='center')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, 'model_comparison.png'))
-    plt.close()
+    if report_plots:
+        import reporting
+        reporting.plot_model_comparison(models, accuracy, f1_score)
     
     # Print comparison results
     print("\n--- Model Comparison ---")
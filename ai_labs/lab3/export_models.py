@@ -0,0 +1,223 @@
+import os
+import csv
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+from config import *
+from data_utils import create_tf_dataset, iterate_batches
+from model_registry import KERAS_MODELS, load_model_file
+
+EXPORT_FORMATS = ['tflite_float', 'tflite_dynamic', 'tflite_int8', 'onnx']
+
+class TFLiteModel:
+    """Run a .tflite file with a Keras-like predict(batch).
+
+    The interpreter memory-maps the file instead of reading it into a
+    TensorFlow graph, so loading is fast and cheap. Resizing the input
+    re-plans the tensor arena, so batches are zero-padded to the next power
+    of two and each of these sizes keeps an interpreter allocated for it.
+    """
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.num_threads = num_threads or os.cpu_count()
+        self.interpreters = {}  # padded batch size -> interpreter allocated for it
+        interpreter = tf.lite.Interpreter(model_path=path, num_threads=self.num_threads)
+        self.input_index = interpreter.get_input_details()[0]['index']
+        self.output_index = interpreter.get_output_details()[0]['index']
+        # A flexible (None, None, 3) input (progressive resizing) is exported with -1 dims; serve it at IMG_SIZE
+        signature = interpreter.get_input_details()[0]['shape_signature'][1:]
+        self.image_shape = [IMG_SIZE if dim == -1 else int(dim) for dim in signature]
+
+    def _interpreter(self, batch_size):
+        if batch_size not in self.interpreters:
+            interpreter = tf.lite.Interpreter(model_path=self.path, num_threads=self.num_threads)
+            interpreter.resize_tensor_input(self.input_index, [batch_size] + self.image_shape)
+            interpreter.allocate_tensors()
+            self.interpreters[batch_size] = interpreter
+        return self.interpreters[batch_size]
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        num_images = len(batch)
+        padded_size = 1 << (num_images - 1).bit_length()
+        if padded_size != num_images:
+            padding = np.zeros((padded_size - num_images,) + batch.shape[1:], dtype=np.float32)
+            batch = np.concatenate([batch, padding])
+
+        interpreter = self._interpreter(padded_size)
+        interpreter.set_tensor(self.input_index, batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(self.output_index)[:num_images]
+
+    def predict_on_batch(self, batch):
+        return self.predict(batch)
+
+class ONNXModel:
+    """Run a .onnx file with onnxruntime (optional dependency) with a Keras-like predict(batch)."""
+    def __init__(self, path):
+        import onnxruntime
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch, verbose=0):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+    def predict_on_batch(self, batch):
+        return self.predict(batch)
+
+def representative_dataset(num_samples=REPRESENTATIVE_SAMPLES):
+    """Calibration images for full-int8 quantization: a shuffled, unaugmented sample of the train split."""
+    train_data = create_tf_dataset(os.path.join(BASE_DIR, "train"), training=True, augment=False)
+
+    def generator():
+        count = 0
+        for x_batch, _ in iterate_batches(train_data):
+            for image in x_batch:
+                if count == num_samples:
+                    return
+                yield [image[np.newaxis].astype(np.float32)]
+                count += 1
+
+    return generator
+
+def export_tflite(model, path, quantization=None, num_samples=REPRESENTATIVE_SAMPLES):
+    """Convert a Keras model to TFLite: float32, "dynamic" (int8 weights) or "int8" (int8 weights and activations).
+
+    The full-int8 model keeps float32 input/output, so it takes the same
+    normalized images as the Keras model.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        converter.representative_dataset = representative_dataset(num_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+def export_onnx(model, path):
+    """Convert a Keras model to ONNX with tf2onnx (optional dependency)."""
+    import tf2onnx
+    input_signature = [tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name='input')]
+    tf2onnx.convert.from_function(
+        tf.function(lambda x: model(x, training=False)),
+        input_signature=input_signature,
+        opset=13,
+        output_path=path
+    )
+    return path
+
+def measure_accuracy(model, test_data):
+    """Top-1 accuracy of anything with a predict(batch) method on the test split."""
+    correct = 0
+    total = 0
+    for x_batch, y_batch in iterate_batches(test_data):
+        predictions = model.predict(x_batch, verbose=0)
+        correct += int(np.sum(np.argmax(predictions, axis=1) == np.argmax(y_batch, axis=1)))
+        total += len(y_batch)
+    return correct / total
+
+def measure_latency(model, image, runs=50):
+    """Median latency in milliseconds of predicting a single image.
+
+    Uses predict_on_batch, so the .keras baseline is timed without predict()'s
+    per-call dataset and callback setup, like the TFLite and ONNX runners.
+    """
+    for _ in range(3):
+        model.predict_on_batch(image)  # Warm up (tracing)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict_on_batch(image)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+def export_model(name, formats, num_samples=REPRESENTATIVE_SAMPLES):
+    """Export one trained model to the requested formats and return {format: artifact path}."""
+    model = load_model(os.path.join(MODEL_DIR, KERAS_MODELS[name]))
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+
+    artifacts = {'keras': os.path.join(MODEL_DIR, KERAS_MODELS[name])}
+    for fmt in formats:
+        if fmt == 'onnx':
+            try:
+                path = export_onnx(model, os.path.join(EXPORT_DIR, f"{name}.onnx"))
+            except ImportError:
+                print("tf2onnx is not installed (pip install tf2onnx onnxruntime); skipping ONNX export.")
+                continue
+        else:
+            quantization = {'tflite_float': None, 'tflite_dynamic': 'dynamic', 'tflite_int8': 'int8'}[fmt]
+            path = export_tflite(model, os.path.join(EXPORT_DIR, f"{name}_{fmt.split('_')[1]}.tflite"),
+                                 quantization, num_samples)
+        print(f"Exported {name} ({fmt}) to {path}")
+        artifacts[fmt] = path
+
+    return artifacts
+
+def main():
+    parser = argparse.ArgumentParser(description='Export trained models to TFLite/ONNX and compare accuracy, latency and size')
+    parser.add_argument('--models', nargs='+', choices=list(KERAS_MODELS), default=list(KERAS_MODELS),
+                        help='Trained models to export')
+    parser.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=EXPORT_FORMATS,
+                        help='Export formats')
+    parser.add_argument('--representative-samples', type=int, default=REPRESENTATIVE_SAMPLES,
+                        help='Train images used to calibrate full-int8 quantization')
+    parser.add_argument('--runs', type=int, default=50,
+                        help='Timed single-image predictions per artifact')
+    args = parser.parse_args()
+
+    test_data = create_tf_dataset(os.path.join(BASE_DIR, "test"))
+    image = next(iterate_batches(test_data))[0][:1]
+
+    rows = []
+    for name in args.models:
+        artifacts = export_model(name, args.formats, args.representative_samples)
+
+        baseline = None
+        for fmt, path in artifacts.items():
+            if fmt == 'onnx':
+                try:
+                    model = load_model_file(path)
+                except ImportError:
+                    print("onnxruntime is not installed; reporting the ONNX file size only.")
+                    rows.append({'model': name, 'format': fmt, 'size_mb': round(os.path.getsize(path) / 2**20, 2)})
+                    continue
+            else:
+                model = load_model_file(path)
+
+            print(f"Benchmarking {name} ({fmt})...")
+            row = {
+                'model': name,
+                'format': fmt,
+                'size_mb': round(os.path.getsize(path) / 2**20, 2),
+                'accuracy': round(measure_accuracy(model, test_data), 4),
+                'latency_ms': round(measure_latency(model, image, args.runs), 2),
+            }
+            # Deltas are relative to the original .keras model
+            baseline = baseline or row
+            row['accuracy_delta'] = round(row['accuracy'] - baseline['accuracy'], 4)
+            row['speedup'] = round(baseline['latency_ms'] / row['latency_ms'], 2)
+            row['size_ratio'] = round(baseline['size_mb'] / row['size_mb'], 2)
+            rows.append(row)
+
+    fieldnames = ['model', 'format', 'size_mb', 'accuracy', 'accuracy_delta', 'latency_ms', 'speedup', 'size_ratio']
+    print(f"\n{'Model':<10}{'Format':<16}{'Size (MB)':>10}{'Accuracy':>10}{'Delta':>8}{'Latency (ms)':>14}{'Speedup':>9}")
+    for row in rows:
+        print(f"{row['model']:<10}{row['format']:<16}{row['size_mb']:>10}{row.get('accuracy', ''):>10}"
+              f"{row.get('accuracy_delta', ''):>8}{row.get('latency_ms', ''):>14}{row.get('speedup', ''):>9}")
+
+    report_path = os.path.join(RESULTS_DIR, 'export_report.csv')
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Report saved to {report_path}")
+
+if __name__ == "__main__":
+    main()
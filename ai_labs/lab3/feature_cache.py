@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import numpy as np
+import tensorflow as tf
+from config import *
+from data_utils import iterate_batches
+
+def _cache_key(data, passes, extra=None):
+    """Identify a loader's contents (sample count and label order) plus the caching parameters."""
+    digest = hashlib.sha256(np.asarray(data.classes, dtype=np.int32).tobytes())
+    digest.update(json.dumps({'passes': passes, 'extra': extra}, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def cache_features(extractor, data, name, passes=1, augmentation=None, extra_key=None):
+    """Run a frozen feature extractor over a loader and cache its outputs on disk.
+
+    Each pass is one epoch of the loader (a fresh augmentation draw for the
+    training split), so the cache holds passes x N feature rows. The arrays are
+    stored as .npy memmaps in FEATURE_CACHE_DIR and reused while the loader's
+    contents and the parameters are unchanged. `augmentation`, if given, is
+    applied to every batch in training mode before the extractor.
+    """
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    features_path = os.path.join(FEATURE_CACHE_DIR, f"{name}_features.npy")
+    labels_path = os.path.join(FEATURE_CACHE_DIR, f"{name}_labels.npy")
+    meta_path = os.path.join(FEATURE_CACHE_DIR, f"{name}_meta.json")
+    key = _cache_key(data, passes, extra_key)
+
+    if all(os.path.exists(path) for path in (features_path, labels_path, meta_path)):
+        with open(meta_path) as f:
+            if json.load(f).get('key') == key:
+                print(f"Using cached features for '{name}'.")
+                return np.load(features_path, mmap_mode='r'), np.load(labels_path)
+
+    num_samples = data.samples
+    features = None
+    labels = None
+    row = 0
+
+    print(f"Caching features for '{name}' ({passes} pass(es) over {num_samples} images)...")
+    for pass_idx in range(passes):
+        # Reseed so each pass corresponds to a fixed augmentation seed
+        np.random.seed(42 + pass_idx)
+        tf.random.set_seed(42 + pass_idx)
+        for x_batch, y_batch in iterate_batches(data):
+            if augmentation is not None:
+                x_batch = augmentation(x_batch, training=True)
+            batch_features = np.asarray(extractor(x_batch, training=False), dtype=np.float32)
+
+            if features is None:
+                # Output shape is only known after the first batch
+                features = np.lib.format.open_memmap(
+                    features_path + ".tmp", mode='w+', dtype=batch_features.dtype,
+                    shape=(passes * num_samples,) + batch_features.shape[1:]
+                )
+                labels = np.empty((passes * num_samples,) + y_batch.shape[1:], dtype=np.float32)
+
+            features[row:row + len(x_batch)] = batch_features
+            labels[row:row + len(x_batch)] = y_batch
+            row += len(x_batch)
+
+    features.flush()
+    del features
+    os.replace(features_path + ".tmp", features_path)
+    np.save(labels_path, labels)
+    with open(meta_path, 'w') as f:
+        json.dump({'key': key, 'num_rows': row}, f)
+
+    return np.load(features_path, mmap_mode='r'), labels
+
+def cached_pass_dataset(features, labels, passes=1, batch_size=BATCH_SIZE, training=False):
+    """Batch cached rows so that one epoch covers one augmentation pass.
+
+    The cache stores the passes back to back, N rows each. For training the
+    dataset repeats forever and steps through pass 0, 1, ... in turn, each
+    shuffled, so with steps_per_epoch = ceil(N / batch_size) an epoch sees
+    every image once, as with the uncached loader. Returns the dataset and
+    its steps per epoch.
+    """
+    num_samples = len(labels) // passes
+    steps = -(-num_samples // batch_size)
+    feature_shape = features.shape[1:]
+    labels = tf.constant(labels)
+
+    def gather(idx):
+        return np.asarray(features[idx], dtype=np.float32)
+
+    def load_batch(idx):
+        # Sorted indices keep reads sequential within the memmap
+        idx = tf.sort(idx)
+        x = tf.numpy_function(gather, [idx], tf.float32)
+        x.set_shape((None,) + feature_shape)
+        return x, tf.gather(labels, idx)
+
+    # Row order within a pass. Shuffled once here rather than per pass: a seeded shuffle built
+    # inside flat_map restarts from the same seed on every pass and replays one permutation
+    order = tf.data.Dataset.range(num_samples)
+    if training:
+        order = order.shuffle(num_samples, reshuffle_each_iteration=True)
+
+    def pass_batches(pass_idx):
+        return order.map(lambda row: pass_idx * num_samples + row).batch(batch_size)
+
+    dataset = tf.data.Dataset.range(passes)
+    if training:
+        dataset = dataset.repeat()
+    dataset = dataset.flat_map(pass_batches)
+    dataset = dataset.map(load_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE), steps
@@ -1,59 +1,261 @@
 import os
+import csv
+import time
+import itertools
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import tensorflow as tf
-import matplotlib.pyplot as plt
-from tensorflow.keras.models import load_model
+from PIL import Image
 from tensorflow.keras.preprocessing import image
 import argparse
 from config import *
-import seaborn as sns
-from sklearn.metrics import classification_report, confusion_matrix
+from model_registry import get_registry, default_model_paths
+from streaming_metrics import StreamingMetrics
+from dataset_state import prepared_settings
+from data_utils import (create_tf_dataset, create_cached_dataset, create_tfrecord_dataset, flow_from_split,
+                        iterate_batches, IMAGE_EXTENSIONS)
 import json
 
-def load_and_preprocess_image(img_path, target_size=(IMG_SIZE, IMG_SIZE)):
+def decode_image(source, target_size=(IMG_SIZE, IMG_SIZE), draft=DRAFT_DECODE):
+    """Decode an image (path or file object) to target_size as a uint8 RGB PIL image.
+    
+    The image is decoded at full resolution and resized with nearest-neighbour
+    sampling, like load_img and the training loaders. With draft, JPEGs are
+    first downscaled by 1/2, 1/4 or 1/8 inside the decoder (DCT scaling, PIL
+    draft mode) to the smallest size still covering target_size. That skips
+    most of the full-resolution pixels but averages blocks of them, so the
+    model sees smoother inputs than it was trained on (see benchmark_decode.py).
+    """
+    img = Image.open(source)
+    size = (target_size[1], target_size[0])  # PIL sizes are (width, height)
+    if draft:
+        img.draft('RGB', size)  # No-op for formats other than JPEG
+    img = img.convert('RGB')
+    if img.size != size:
+        # Nearest neighbour, like load_img and the training loaders
+        img = img.resize(size, Image.NEAREST)
+    return img
+
+def preprocess_into(img, out):
+    """Write a decoded uint8 image into a float32 buffer slice and normalize it to [0,1] in place."""
+    out[...] = np.asarray(img)
+    out *= 1 / 255.0
+
+def load_and_preprocess_image(img_path, target_size=(IMG_SIZE, IMG_SIZE), draft=DRAFT_DECODE):
     """Load and preprocess an image for inference."""
-    img = image.load_img(img_path, target_size=target_size)
-    img_array = image.img_to_array(img)
-    img_array = img_array / 255.0  # Normalize to [0,1]
-    img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
+    img = decode_image(img_path, target_size, draft)
+    img_array = np.empty((1, *target_size, 3), dtype=np.float32)  # With batch dimension
+    preprocess_into(img, img_array[0])
     return img, img_array
 
-def predict_image(model, img_path, class_indices):
+@functools.lru_cache(maxsize=None)
+def load_class_indices():
+    """Load the class name -> index mapping once per process."""
+    class_mapping_file = os.path.join(BASE_DIR, 'class_indices.json')
+    
+    if os.path.exists(class_mapping_file):
+        with open(class_mapping_file, 'r') as f:
+            return json.load(f)
+    
+    # Fallback to using folder names if mapping file doesn't exist
+    print("Warning: Class mapping file not found. Using folder names as fallback.")
+    train_dir = os.path.join(BASE_DIR, "train")
+    class_indices = {}
+    for i, class_name in enumerate(sorted(os.listdir(train_dir))):
+        if os.path.isdir(os.path.join(train_dir, class_name)):
+            class_indices[class_name] = i
+    return class_indices
+
+@functools.lru_cache(maxsize=None)
+def _class_names(class_items):
+    names = [None] * len(class_items)
+    for name, idx in class_items:
+        names[idx] = name
+    return names
+
+def get_class_names(class_indices):
+    """Class names ordered by index, built once per mapping."""
+    return _class_names(tuple(class_indices.items()))
+
+def predict_image(model, img_path, class_indices, draft=DRAFT_DECODE):
     """Make a prediction for an image."""
     # Load and preprocess the image
-    original_img, processed_img = load_and_preprocess_image(img_path)
+    original_img, processed_img = load_and_preprocess_image(img_path, draft=draft)
     
     # Make prediction
-    predictions = model.predict(processed_img)
+    predictions = model.predict_on_batch(processed_img)
     predicted_class_idx = np.argmax(predictions[0])
     confidence = predictions[0][predicted_class_idx]
     
     # Get class name from index
-    class_names = {v: k for k, v in class_indices.items()}
-    predicted_class = class_names[predicted_class_idx]
+    predicted_class = get_class_names(class_indices)[predicted_class_idx]
     
     return original_img, predicted_class, confidence, predictions[0]
 
-def evaluate_model(model, test_generator, model_name="model"):
-    """Evaluate model on the test dataset and return metrics."""
-    print(f"Evaluating {model_name}...")
-    
-    # Get predictions
-    predictions = model.predict(test_generator, verbose=1)
-    y_pred = np.argmax(predictions, axis=1)
-    
-    # Get true labels
-    y_true = test_generator.classes
-    
-    # Calculate metrics
-    report = classification_report(
-        y_true, 
-        y_pred, 
-        target_names=list(test_generator.class_indices.keys()),
-        output_dict=True
-    )
-    
-    # Print metrics summary
+def list_input_images(input_dir=None, file_list=None):
+    """Image paths from a directory (searched recursively) and/or a text file with one path per line."""
+    paths = []
+    if input_dir is not None:
+        for root, _, files in os.walk(input_dir):
+            paths.extend(os.path.join(root, fname) for fname in files if fname.lower().endswith(IMAGE_EXTENSIONS))
+        paths.sort()
+    if file_list is not None:
+        with open(file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    return paths
+
+def _decode_into(path, out, target_size, draft):
+    preprocess_into(decode_image(path, target_size, draft), out)
+
+def _finish_batch(batch_paths, images, futures):
+    """Wait for a batch to be decoded and drop the images that failed."""
+    decoded = []
+    for path, future in zip(batch_paths, futures):
+        try:
+            future.result()
+            decoded.append(True)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            decoded.append(False)
+    
+    if not all(decoded):
+        images = images[np.array(decoded)]
+        batch_paths = [path for path, ok in zip(batch_paths, decoded) if ok]
+    return batch_paths, images
+
+def iter_image_batches(paths, batch_size=BATCH_SIZE, workers=os.cpu_count(), target_size=(IMG_SIZE, IMG_SIZE),
+                       draft=DRAFT_DECODE):
+    """Decode images on a thread pool and yield (paths, images) batches.
+    
+    The next batch is decoded while the consumer predicts the current one.
+    Workers decode straight into one of three preallocated batch buffers, so
+    a yielded array is only valid until the consumer asks for the next-but-one
+    batch. Unreadable images are skipped.
+    """
+    path_iter = iter(paths)
+    batches = iter(lambda: list(itertools.islice(path_iter, batch_size)), [])
+    buffers = [np.empty((batch_size, *target_size, 3), dtype=np.float32) for _ in range(3)]
+    pending = deque()
+    
+    with ThreadPoolExecutor(workers) as pool:
+        for batch_number, batch_paths in enumerate(batches):
+            images = buffers[batch_number % len(buffers)][:len(batch_paths)]
+            futures = [
+                pool.submit(_decode_into, path, images[slot], target_size, draft)
+                for slot, path in enumerate(batch_paths)
+            ]
+            pending.append((batch_paths, images, futures))
+            
+            # Keep one batch decoding ahead of the one being yielded
+            if len(pending) > 1:
+                batch_paths, images = _finish_batch(*pending.popleft())
+                if batch_paths:
+                    yield batch_paths, images
+        
+        while pending:
+            batch_paths, images = _finish_batch(*pending.popleft())
+            if batch_paths:
+                yield batch_paths, images
+
+def predict_images(model, paths, class_indices, batch_size=BATCH_SIZE, workers=os.cpu_count(), top_k=3,
+                   draft=DRAFT_DECODE):
+    """Classify many images in batches, yielding one result dict per image."""
+    class_names = get_class_names(class_indices)
+    top_k = min(top_k, len(class_names))
+    
+    for batch_paths, images in iter_image_batches(paths, batch_size, workers, draft=draft):
+        predictions = np.asarray(model.predict_on_batch(images))
+        top_indices = np.argsort(predictions, axis=1)[:, ::-1][:, :top_k]
+        
+        for path, probs, indices in zip(batch_paths, predictions, top_indices):
+            yield {
+                'path': path,
+                'prediction': class_names[indices[0]],
+                'confidence': float(probs[indices[0]]),
+                'top_k': [(class_names[idx], float(probs[idx])) for idx in indices],
+            }
+
+def write_predictions(results, output_path):
+    """Stream prediction results to CSV or, for a .jsonl path, JSON Lines; returns the number written."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    count = 0
+    with open(output_path, 'w', newline='') as f:
+        if output_path.endswith('.jsonl'):
+            for result in results:
+                record = {**result, 'top_k': [{'class': name, 'probability': prob} for name, prob in result['top_k']]}
+                f.write(json.dumps(record) + "\n")
+                count += 1
+            return count
+        
+        writer = None
+        for result in results:
+            row = {'path': result['path'], 'prediction': result['prediction'], 'confidence': result['confidence']}
+            for rank, (name, prob) in enumerate(result['top_k'], start=1):
+                row[f'top{rank}_class'] = name
+                row[f'top{rank}_probability'] = prob
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+def render_prediction(img, top_predictions, result_path, show=False):
+    """Save (and optionally show) an image with its top (class, probability) predictions."""
+    import matplotlib.pyplot as plt
+    
+    predicted_class, confidence = top_predictions[0]
+    plt.figure(figsize=(8, 6))
+    plt.imshow(img)
+    plt.title(f"Prediction: {predicted_class}\nConfidence: {confidence:.2f}")
+    plt.axis('off')
+    
+    plt.figtext(0.5, 0.01, 
+               f"Top predictions:\n" + 
+               "\n".join([f"{name}: {prob:.2f}" for name, prob in top_predictions]),
+               ha="center", fontsize=12, bbox={"facecolor":"white", "alpha":0.8, "pad":5})
+    
+    plt.tight_layout()
+    
+    # Save and show result
+    os.makedirs(os.path.dirname(result_path), exist_ok=True)
+    plt.savefig(result_path)
+    print(f"Result saved as {result_path}")
+    if show:
+        plt.show()
+    plt.close()
+
+def evaluate_models(models, test_generator, num_samples=6):
+    """Evaluate several models in one pass over the test set.
+    
+    Every decoded batch is predicted by all models, and each model only keeps
+    its running StreamingMetrics. Returns {name: {'report', 'confusion_matrix',
+    'metrics'}} and the first num_samples test images with every model's
+    predictions.
+    """
+    class_names = list(test_generator.class_indices.keys())
+    metrics = {name: StreamingMetrics(class_names) for name in models}
+    samples = None
+    
+    print(f"Evaluating {', '.join(models)} in a single pass over the test set...")
+    for x_batch, y_batch in iterate_batches(test_generator):
+        predictions = {name: np.asarray(model.predict_on_batch(x_batch)) for name, model in models.items()}
+        for name, preds in predictions.items():
+            metrics[name].update(y_batch, preds)
+        
+        if samples is None:
+            samples = (x_batch[:num_samples].copy(), y_batch[:num_samples],
+                       {name: preds[:num_samples] for name, preds in predictions.items()})
+    
+    results = {
+        name: {'report': model_metrics.report(), 'confusion_matrix': model_metrics.confusion, 'metrics': model_metrics}
+        for name, model_metrics in metrics.items()
+    }
+    return results, samples
+
+def print_report(report, model_name):
+    """Print the per-class and overall metrics of a classification report."""
     print(f"\n{model_name} Evaluation Results:")
     print("Classification Report:")
     for cls in report:
@@ -62,258 +264,179 @@ def evaluate_model(model, test_generator, model_name="model"):
     
     print(f"Accuracy: {report['accuracy']:.4f}")
     print(f"Macro Avg F1-Score: {report['macro avg']['f1-score']:.4f}")
-    
-    # Plot confusion matrix
-    cm = confusion_matrix(y_true, y_pred)
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=list(test_generator.class_indices.keys()),
-                yticklabels=list(test_generator.class_indices.keys()))
-    plt.xlabel('Predicted')
-    plt.ylabel('True')
-    plt.title(f'Confusion Matrix - {model_name}')
-    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_confusion_matrix.png'))
-    plt.close()
-    
-    return report
 
-def compare_models(custom_results, transfer_results):
-    """Compare performance of custom and transfer learning models."""
+def compare_models(results):
+    """Compare the performance of several models ({name: classification report})."""
     print("\nComparing models...")
     
-    models = ['Custom CNN', 'Transfer Learning']
-    accuracy = [custom_results['accuracy'], transfer_results['accuracy']]
-    f1_score = [custom_results['macro avg']['f1-score'], transfer_results['macro avg']['f1-score']]
-    
-    plt.figure(figsize=(10, 6))
-    
-    x = np.arange(len(models))
-    width = 0.35
-    
-    plt.bar(x - width/2, accuracy, width, label='Accuracy')
-    plt.bar(x + width/2, f1_score, width, label='Macro F1-Score')
+    models = list(results)
+    accuracy = [results[name]['accuracy'] for name in models]
+    f1_score = [results[name]['macro avg']['f1-score'] for name in models]
     
-    plt.xlabel('Model')
-    plt.ylabel('Score')
-    plt.title('Model Comparison')
-    plt.xticks(x, models)
-    plt.ylim(0, 1)
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    
-    for i, v in enumerate(accuracy):
-        plt.text(i - width/2, v + 0.02, f'{v:.4f}', ha='center')
-    
-    for i, v in enumerate(f1_score):
-        plt.text(i + width/2, v + 0.02, f'{v:.4f}', ha='center')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, 'model_comparison.png'))
-    plt.close()
+    import reporting
+    reporting.plot_model_comparison(models, accuracy, f1_score)
     
     # Print comparison results
     print("\n--- Model Comparison ---")
-    print(f"Custom CNN Accuracy: {accuracy[0]:.4f}, F1-Score: {f1_score[0]:.4f}")
-    print(f"Transfer Learning Accuracy: {accuracy[1]:.4f}, F1-Score: {f1_score[1]:.4f}")
-    
-    if accuracy[1] > accuracy[0]:
-        print("Transfer Learning model performed better on accuracy.")
-    elif accuracy[0] > accuracy[1]:
-        print("Custom CNN model performed better on accuracy.")
-    else:
-        print("Both models had the same accuracy.")
-    
-    if f1_score[1] > f1_score[0]:
-        print("Transfer Learning model performed better on F1-Score.")
-    elif f1_score[0] > f1_score[1]:
-        print("Custom CNN model performed better on F1-Score.")
-    else:
-        print("Both models had the same F1-Score.")
+    for name, acc, f1 in zip(models, accuracy, f1_score):
+        print(f"{name} Accuracy: {acc:.4f}, F1-Score: {f1:.4f}")
+    
+    print(f"Best accuracy: {models[int(np.argmax(accuracy))]}")
+    print(f"Best F1-Score: {models[int(np.argmax(f1_score))]}")
 
 def get_test_generator():
     """Create a test data generator."""
     test_dir = os.path.join(BASE_DIR, "test")
-    if not os.path.exists(test_dir):
+    settings = prepared_settings()
+    if not os.path.exists(SPLIT_MANIFEST if settings['layout'] == "manifest" else test_dir):
         print(f"Error: Test directory not found at {test_dir}")
         return None
 
+    if settings['loader'] == "tf_data":
+        return create_tf_dataset(test_dir)
+    if settings['loader'] == "cache":
+        return create_cached_dataset(test_dir)
+    if settings['loader'] == "tfrecord":
+        return create_tfrecord_dataset(test_dir)
+
     # Create test data generator
     from tensorflow.keras.preprocessing.image import ImageDataGenerator
     test_datagen = ImageDataGenerator(rescale=1./255)
     
-    test_generator = test_datagen.flow_from_directory(
-        test_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=False
-    )
+    test_generator = flow_from_split(test_datagen, test_dir, shuffle=False)
     
     return test_generator
 
-def visualize_sample_predictions(custom_model, transfer_model, test_generator):
-    """Visualize sample predictions from both models."""
-    # Reset generator to start
-    test_generator.reset()
-    
-    # Get a batch of test images
-    x_batch, y_batch = next(test_generator)
-    
-    # Make predictions
-    custom_preds = custom_model.predict(x_batch)
-    transfer_preds = transfer_model.predict(x_batch)
-    
-    # Plot images with predictions
-    plt.figure(figsize=(15, 10))
-    class_names = list(test_generator.class_indices.keys())
-    
-    # Display 6 images
-    for i in range(min(6, len(x_batch))):
-        plt.subplot(2, 3, i+1)
-        plt.imshow(x_batch[i])
-        
-        true_class_idx = np.argmax(y_batch[i])
-        custom_pred_idx = np.argmax(custom_preds[i])
-        transfer_pred_idx = np.argmax(transfer_preds[i])
-        
-        true_class = class_names[true_class_idx]
-        custom_pred = class_names[custom_pred_idx]
-        transfer_pred = class_names[transfer_pred_idx]
-        
-        custom_conf = custom_preds[i][custom_pred_idx]
-        transfer_conf = transfer_preds[i][transfer_pred_idx]
-        
-        # Set title colors based on correctness
-        custom_color = 'green' if true_class_idx == custom_pred_idx else 'red'
-        transfer_color = 'green' if true_class_idx == transfer_pred_idx else 'red'
-        
-        plt.title(f"True: {true_class}\n"
-                  f"Custom: {custom_pred} ({custom_conf:.2f})\n"
-                  f"Transfer: {transfer_pred} ({transfer_conf:.2f})",
-                  fontsize=10)
-        
-        plt.axis('off')
-    
-    plt.suptitle('Sample Predictions Comparison', fontsize=16)
-    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-    plt.savefig(os.path.join(RESULTS_DIR, 'sample_predictions_comparison.png'))
-    plt.close()
-    
-    print(f"Sample predictions comparison saved to {os.path.join(RESULTS_DIR, 'sample_predictions_comparison.png')}")
+# Report names of the registry keys (also used in the result file names)
+DISPLAY_NAMES = {'custom': 'Custom CNN', 'transfer': 'Transfer Learning'}
 
-def run_model_comparison():
-    """Run evaluation on both models and compare their performance."""
+def run_model_comparison(model_keys=('custom', 'transfer')):
+    """Evaluate several models (registry keys) in one pass over the test set and compare their performance."""
     # Create test generator
     test_generator = get_test_generator()
     if test_generator is None:
         return
     
-    # Load models
-    custom_model_path = os.path.join(MODEL_DIR, 'best_custom_model.keras')
-    transfer_model_path = os.path.join(MODEL_DIR, 'best_transfer_model_phase2.keras')
-    
-    if not os.path.exists(custom_model_path):
-        print(f"Error: Custom model not found at {custom_model_path}")
-        return
-    
-    if not os.path.exists(transfer_model_path):
-        print(f"Error: Transfer learning model not found at {transfer_model_path}")
+    # Load models (already warm if this process used them before)
+    print("Loading models...")
+    try:
+        models = {DISPLAY_NAMES.get(key, key): get_registry().get(key) for key in model_keys}
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
         return
     
-    print("Loading models...")
-    custom_model = load_model(custom_model_path)
-    transfer_model = load_model(transfer_model_path)
+    import reporting
     
-    # Evaluate models
-    custom_results = evaluate_model(custom_model, test_generator, "Custom CNN")
-    transfer_results = evaluate_model(transfer_model, test_generator, "Transfer Learning")
+    # Evaluate all models on each decoded batch
+    results, (x_batch, y_batch, sample_predictions) = evaluate_models(models, test_generator)
+    class_names = list(test_generator.class_indices.keys())
+    for name, result in results.items():
+        print_report(result['report'], name)
+        print(result['metrics'].summary())
+        reporting.plot_confusion_matrix(result['confusion_matrix'], class_names, name)
     
     # Compare models
-    compare_models(custom_results, transfer_results)
+    compare_models({name: result['report'] for name, result in results.items()})
     
-    # Visualize sample predictions
-    visualize_sample_predictions(custom_model, transfer_model, test_generator)
+    # Visualize sample predictions (from the first test batch, already predicted)
+    reporting.visualize_sample_predictions(x_batch, y_batch, sample_predictions, class_names)
     
     print("\nModel comparison completed successfully.")
 
+def run_batch_inference(model, paths, class_indices, output_path, batch_size=BATCH_SIZE, workers=os.cpu_count(),
+                        top_k=3, render=False, draft=DRAFT_DECODE):
+    """Classify a list of images and write the results; optionally render every prediction."""
+    print(f"Classifying {len(paths)} images (batch size {batch_size}, {workers} decode workers)...")
+    start = time.perf_counter()
+    
+    results = predict_images(model, paths, class_indices, batch_size, workers, top_k, draft)
+    if render:
+        results = _rendered(results)
+    count = write_predictions(results, output_path)
+    
+    elapsed = time.perf_counter() - start
+    print(f"Classified {count} images in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.1f} images/sec).")
+    print(f"Predictions saved to {output_path}")
+
+def _rendered(results):
+    """Pass results through, rendering each one to results/inference/."""
+    for result in results:
+        img = image.load_img(result['path'])
+        result_path = os.path.join(RESULTS_DIR, "inference", f"{os.path.basename(result['path'])}.png")
+        render_prediction(img, result['top_k'], result_path)
+        yield result
+
 def main():
     parser = argparse.ArgumentParser(description='Flower Image Classification Inference')
-    parser.add_argument('--model', type=str, choices=['custom', 'transfer'], 
-                        help='Model to use for inference: custom or transfer')
+    parser.add_argument('--model', type=str, choices=list(default_model_paths()), 
+                        help='Model to use for inference: custom or transfer, or an exported variant such as transfer:int8')
     parser.add_argument('--image', type=str, 
                         help='Path to the image file')
+    parser.add_argument('--compare', nargs='+', choices=list(default_model_paths()), default=['custom', 'transfer'],
+                        help='Models evaluated and compared (in one test-set pass) when no image input is given')
+    parser.add_argument('--input-dir', type=str,
+                        help='Classify every image in this directory (recursively)')
+    parser.add_argument('--file-list', type=str,
+                        help='Classify the images listed in this text file (one path per line)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='Images per prediction batch (batch modes)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Parallel image decode threads (batch modes)')
+    parser.add_argument('--top-k', type=int, default=3,
+                        help='Number of top classes recorded per image (batch modes)')
+    parser.add_argument('--output', type=str, default=os.path.join(RESULTS_DIR, 'predictions.csv'),
+                        help='Output file (batch modes): .csv, or .jsonl for JSON Lines')
+    parser.add_argument('--render', action='store_true',
+                        help='Also save a figure per image to results/inference/ (batch modes)')
+    parser.add_argument('--draft-decode', action=argparse.BooleanOptionalAction, default=DRAFT_DECODE,
+                        help='Decode JPEGs at reduced scale in the decoder (faster on large photos, unlike training)')
     
     args = parser.parse_args()
+    inputs = [value for value in (args.image, args.input_dir, args.file_list) if value is not None]
     
     # Check if we should run model comparison (no args provided)
-    if args.model is None and args.image is None:
+    if args.model is None and not inputs:
         print("Running full model comparison and evaluation...")
-        run_model_comparison()
+        run_model_comparison(args.compare)
         return
     
     # If only one arg is provided, show error message
-    if (args.model is None and args.image is not None) or (args.model is not None and args.image is None):
-        print("Error: Both --model and --image arguments must be provided for single-image inference.")
+    if args.model is None or not inputs:
+        print("Error: --model and one of --image, --input-dir or --file-list must be provided for inference.")
         print("Run without arguments to perform full model evaluation and comparison.")
         return
-    
-    # Load model for single image inference
-    if args.model == 'custom':
-        model_path = os.path.join(MODEL_DIR, 'best_custom_model.keras')
-        model_name = "Custom CNN"
-    else:  # transfer
-        model_path = os.path.join(MODEL_DIR, 'best_transfer_model_phase2.keras')
-        model_name = "Transfer Learning"
-    
-    if not os.path.exists(model_path):
-        print(f"Error: Model file not found at {model_path}")
+    if args.image is not None and len(inputs) > 1:
+        print("Error: --image cannot be combined with --input-dir or --file-list.")
         return
     
-    print(f"Loading {model_name} model...")
-    model = load_model(model_path)
-    
-    # Load class mapping from a file
-    class_mapping_file = os.path.join(BASE_DIR, 'class_indices.json')
-    
-    if os.path.exists(class_mapping_file):
-        with open(class_mapping_file, 'r') as f:
-            class_indices = json.load(f)
-    else:
-        # Fallback to using folder names if mapping file doesn't exist
-        print("Warning: Class mapping file not found. Using folder names as fallback.")
-        train_dir = os.path.join(BASE_DIR, "train")
-        class_indices = {}
-        for i, class_name in enumerate(sorted(os.listdir(train_dir))):
-            if os.path.isdir(os.path.join(train_dir, class_name)):
-                class_indices[class_name] = i
+    # Load model for inference
+    print(f"Loading {args.model} model...")
+    try:
+        model = get_registry().get(args.model)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+    class_indices = load_class_indices()
+    
+    # Batch modes
+    if args.image is None:
+        paths = list_input_images(args.input_dir, args.file_list)
+        if not paths:
+            print("Error: No images found.")
+            return
+        run_batch_inference(model, paths, class_indices, args.output, args.batch_size, args.workers,
+                            args.top_k, args.render, args.draft_decode)
+        return
     
     # Make prediction on single image
     try:
-        img, predicted_class, confidence, all_probs = predict_image(model, args.image, class_indices)
+        img, predicted_class, confidence, all_probs = predict_image(model, args.image, class_indices, args.draft_decode)
         
-        # Display result
-        plt.figure(figsize=(8, 6))
-        plt.imshow(img)
-        plt.title(f"Prediction: {predicted_class}\nConfidence: {confidence:.2f}")
-        plt.axis('off')
-        
-        # Show top 3 predictions
-        top_indices = np.argsort(all_probs)[-3:][::-1]
-        class_names = {v: k for k, v in class_indices.items()}
-        
-        plt.figtext(0.5, 0.01, 
-                   f"Top predictions:\n" + 
-                   "\n".join([f"{class_names[idx]}: {all_probs[idx]:.2f}" for idx in top_indices]),
-                   ha="center", fontsize=12, bbox={"facecolor":"white", "alpha":0.8, "pad":5})
-        
-        plt.tight_layout()
-        
-        # Save and show result
-        os.makedirs(RESULTS_DIR, exist_ok=True)
+        # Display result with the top 3 predictions
+        class_names = get_class_names(class_indices)
+        top_predictions = [(class_names[idx], all_probs[idx]) for idx in np.argsort(all_probs)[-3:][::-1]]
         result_path = os.path.join(RESULTS_DIR, f"inference_result_{os.path.basename(args.image)}")
-        plt.savefig(result_path)
-        print(f"Result saved as {result_path}")
-        plt.show()
+        render_prediction(img, top_predictions, result_path, show=True)
         
     except Exception as e:
         print(f"Error during inference: {e}")
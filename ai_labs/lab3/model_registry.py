@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from config import *
+
+# Trained Keras models; "<name>:<variant>" keys are added for the artifacts of export_models.py
+KERAS_MODELS = {
+    'custom': 'best_custom_model.keras',
+    'transfer': 'best_transfer_model_phase2.keras',
+}
+EXPORT_VARIANTS = {
+    'float': '{name}_float.tflite',
+    'dynamic': '{name}_dynamic.tflite',
+    'int8': '{name}_int8.tflite',
+    'onnx': '{name}.onnx',
+}
+
+def default_model_paths():
+    """All registry keys and model files: "custom", "transfer" and e.g. "transfer:int8" for exported variants."""
+    paths = {}
+    for name, filename in KERAS_MODELS.items():
+        paths[name] = os.path.join(MODEL_DIR, filename)
+        for variant, pattern in EXPORT_VARIANTS.items():
+            paths[f"{name}:{variant}"] = os.path.join(EXPORT_DIR, pattern.format(name=name))
+    return paths
+
+def load_model_file(path):
+    """Load a .keras, .tflite (memory-mapped by the interpreter) or .onnx model."""
+    if path.endswith('.tflite'):
+        from export_models import TFLiteModel
+        return TFLiteModel(path)
+    if path.endswith('.onnx'):
+        from export_models import ONNXModel
+        return ONNXModel(path)
+
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+class ModelRegistry:
+    """Lazily loaded models keyed by name/version, kept in memory under a RAM budget with LRU eviction.
+
+    The memory of a model is estimated by its file size (the weights). A
+    model larger than the whole budget is still loaded, evicting every other
+    model. Safe to share between threads: a model is loaded outside the
+    registry lock, so a slow load only blocks callers of the same key.
+    """
+    def __init__(self, budget_mb=MODEL_CACHE_MB, paths=None):
+        self.budget = budget_mb * 2**20
+        self.paths = default_model_paths() if paths is None else dict(paths)
+        self.models = OrderedDict()  # key -> (model, size in bytes), least recently used first
+        self.loading = {}  # key -> (Future of the model, size in bytes) while it is being loaded
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the model for a key, loading it (and evicting least recently used models) if needed."""
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key][0]
+
+            pending = self.loading.get(key)
+            if pending is None:
+                if key not in self.paths:
+                    raise KeyError(f"Unknown model '{key}'. Registered: {list(self.paths)}")
+                path = self.paths[key]
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Model file not found at {path}")
+
+                # Make room before loading; models still being loaded count against the budget
+                size = os.path.getsize(path)
+                while self.models and self.memory_bytes() + size > self.budget:
+                    evicted, _ = self.models.popitem(last=False)
+                    print(f"Evicted model '{evicted}' from memory.")
+                future = Future()
+                self.loading[key] = (future, size)
+
+        if pending is not None:
+            # Another thread is loading this key
+            return pending[0].result()
+
+        try:
+            start = time.perf_counter()
+            model = load_model_file(path)
+            print(f"Loaded model '{key}' in {time.perf_counter() - start:.2f}s.")
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[key]
+            self.models[key] = (model, size)
+        future.set_result(model)
+        return model
+
+    def memory_bytes(self):
+        return (sum(size for _, size in self.models.values())
+                + sum(size for _, size in self.loading.values()))
+
+_registry = None
+
+def get_registry():
+    """The process-wide registry, so every caller shares the warm models."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
@@ -1,17 +1,54 @@
+import time
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential, Model
 from tensorflow.keras.layers import Dense, Dropout, Conv2D, MaxPooling2D, Flatten, BatchNormalization, Input, GlobalAveragePooling2D
+from tensorflow.keras.layers import SeparableConv2D, DepthwiseConv2D, ReLU, Resizing
+from tensorflow.keras.layers import RandomFlip, RandomRotation, RandomTranslation, RandomZoom, RandomBrightness
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.optimizers import Adam
 from config import *
 
-def create_custom_cnn_model(input_shape, num_classes):
-    """Create a custom CNN model."""
+# Lightweight custom CNN family: GAP head, optional depthwise-separable blocks,
+# channel (width) and input resolution multipliers
+LIGHTWEIGHT_VARIANTS = {
+    'lite_w100_224': {'width_multiplier': 1.0, 'resolution_multiplier': 1.0, 'separable': False},
+    'lite_sep_w100_224': {'width_multiplier': 1.0, 'resolution_multiplier': 1.0, 'separable': True},
+    'lite_sep_w075_224': {'width_multiplier': 0.75, 'resolution_multiplier': 1.0, 'separable': True},
+    'lite_sep_w100_160': {'width_multiplier': 1.0, 'resolution_multiplier': 160 / 224, 'separable': True},
+    'lite_sep_w050_160': {'width_multiplier': 0.5, 'resolution_multiplier': 160 / 224, 'separable': True},
+    'lite_sep_w050_128': {'width_multiplier': 0.5, 'resolution_multiplier': 128 / 224, 'separable': True},
+}
+
+def build_augmentation_layers():
+    """Batched Keras preprocessing layers mirroring the ImageDataGenerator augmentation.
+    
+    Used by the tf.data loaders and, with augment=True, inside the models, where
+    the layers are only active during training. Shear has no built-in
+    preprocessing layer and is left out; brightness is applied as an additive
+    shift on the [0, 1] range.
+    """
+    return Sequential([
+        RandomFlip('horizontal_and_vertical'),
+        RandomRotation(20 / 360, fill_mode='nearest'),
+        RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+        RandomZoom(0.2, fill_mode='nearest'),
+        RandomBrightness(0.2, value_range=(0.0, 1.0)),
+    ], name='augmentation')
+
+def create_custom_cnn_model(input_shape, num_classes, augment=AUGMENT_IN_MODEL, jit_compile=False,
+                            learning_rate=0.001):
+    """Create a custom CNN model, optionally with augmentation layers in front."""
     print("Creating custom CNN model...")
     
+    augmentation = [build_augmentation_layers()] if augment else []
+    
     model = Sequential([
+        Input(shape=input_shape),
+        *augmentation,
+        
         # First convolutional block - with 'same' padding
-        Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=input_shape),
+        Conv2D(32, (3, 3), activation='relu', padding='same'),
         Conv2D(32, (3, 3), activation='relu', padding='same'),
         BatchNormalization(),
         MaxPooling2D(2, 2),
@@ -39,20 +76,149 @@ def create_custom_cnn_model(input_shape, num_classes):
         Dropout(0.5),
         Dense(256, activation='relu'),
         Dropout(0.3),
-        Dense(num_classes, activation='softmax')
+        # Keep the softmax in float32 under mixed precision
+        Dense(num_classes, activation='softmax', dtype='float32')
     ])
     
     # Compile model
     model.compile(
-        optimizer=Adam(learning_rate=0.001),
+        optimizer=Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=jit_compile
     )
     
     return model
 
-def create_transfer_learning_model(input_shape, num_classes):
-    """Create a transfer learning model using MobileNetV2."""
+def create_lightweight_cnn_model(input_shape, num_classes, width_multiplier=1.0, resolution_multiplier=1.0,
+                                 separable=True, augment=AUGMENT_IN_MODEL, jit_compile=False, learning_rate=0.001,
+                                 name=None):
+    """Create a compact CNN: strided stem, (separable) conv blocks and a GlobalAveragePooling head.
+    
+    A resolution_multiplier < 1 adds a Resizing layer after the input, so the
+    model still takes IMG_SIZE images from the usual loaders. With a
+    (None, None, 3) input_shape (progressive resizing) the loaders set the
+    resolution and the multiplier is ignored.
+    """
+    print(f"Creating lightweight CNN model {name or ''}...")
+    
+    augmentation = [build_augmentation_layers()] if augment else []
+    size = int(round(input_shape[0] * resolution_multiplier)) if input_shape[0] else None
+    resizing = [Resizing(size, size)] if size != input_shape[0] else []
+    Block = SeparableConv2D if separable else Conv2D
+    
+    def width(filters):
+        return max(8, int(filters * width_multiplier))
+    
+    layers = [
+        Input(shape=input_shape),
+        *augmentation,
+        *resizing,
+        
+        # Stem: a plain strided convolution
+        Conv2D(width(32), (3, 3), strides=2, padding='same', use_bias=False),
+        BatchNormalization(),
+        ReLU(),
+    ]
+    for filters in (64, 128, 256):
+        layers += [
+            Block(width(filters), (3, 3), padding='same', use_bias=False),
+            BatchNormalization(),
+            ReLU(),
+            Block(width(filters), (3, 3), padding='same', use_bias=False),
+            BatchNormalization(),
+            ReLU(),
+            MaxPooling2D(2, 2),
+        ]
+    layers += [
+        # No Flatten: pooling keeps the classifier independent of the resolution
+        GlobalAveragePooling2D(),
+        Dropout(0.3),
+        Dense(num_classes, activation='softmax', dtype='float32')
+    ]
+    
+    model = Sequential(layers, name=name)
+    model.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
+    
+    return model
+
+def count_flops(model):
+    """Analytic FLOPs of one forward pass (2 x multiply-adds of the conv and dense layers)."""
+    flops = 0
+    for layer in model.layers:
+        if hasattr(layer, 'layers'):
+            # Nested models (MobileNetV2 base, augmentation block)
+            flops += count_flops(layer)
+            continue
+        
+        if isinstance(layer, (Conv2D, DepthwiseConv2D, SeparableConv2D)):
+            _, out_h, out_w, _ = layer.output.shape
+            if isinstance(layer, SeparableConv2D):
+                kernels = [layer.depthwise_kernel, layer.pointwise_kernel]
+            else:
+                kernels = [layer.kernel]
+            flops += sum(2 * out_h * out_w * int(np.prod(kernel.shape)) for kernel in kernels)
+        elif isinstance(layer, Dense):
+            flops += 2 * int(np.prod(layer.kernel.shape))
+    return int(flops)
+
+def measure_latency(model, runs=30, batch_size=1):
+    """Median CPU latency in milliseconds of predicting one batch of random images."""
+    batch = np.random.rand(batch_size, *model.input_shape[1:]).astype(np.float32)
+    predict = tf.function(lambda x: model(x, training=False))
+    
+    with tf.device('/CPU:0'):
+        for _ in range(3):
+            predict(batch)  # Warm up (tracing)
+        
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            predict(batch)
+            timings.append(time.perf_counter() - start)
+    
+    return float(np.median(timings) * 1000)
+
+def select_lightweight_variant(input_shape, num_classes, max_mflops=None, max_latency_ms=None):
+    """Pick the most expensive (by FLOPs) lightweight variant that fits the FLOP and/or latency budget."""
+    candidates = []
+    for name, params in LIGHTWEIGHT_VARIANTS.items():
+        model = create_lightweight_cnn_model(input_shape, num_classes, augment=False, name=name, **params)
+        mflops = count_flops(model) / 1e6
+        if max_mflops is not None and mflops > max_mflops:
+            continue
+        if max_latency_ms is not None and measure_latency(model) > max_latency_ms:
+            continue
+        candidates.append((mflops, name))
+    
+    if not candidates:
+        raise ValueError(f"No lightweight variant fits {max_mflops} MFLOPs / {max_latency_ms} ms")
+    
+    mflops, name = max(candidates)
+    print(f"Selected {name} ({mflops:.0f} MFLOPs).")
+    return name
+
+def create_custom_model(input_shape, num_classes, variant=CUSTOM_MODEL, **kwargs):
+    """Create the custom CNN: the baseline, a named lightweight variant, or "budget" (selected by
+    FLOP_BUDGET_MFLOPS / LATENCY_BUDGET_MS)."""
+    if variant == "baseline":
+        return create_custom_cnn_model(input_shape, num_classes, **kwargs)
+    
+    if variant == "budget":
+        # FLOPs and latency need a fixed resolution; a flexible (progressive) input is costed at IMG_SIZE
+        budget_shape = (IMG_SIZE, IMG_SIZE, input_shape[2]) if input_shape[0] is None else input_shape
+        variant = select_lightweight_variant(budget_shape, num_classes, FLOP_BUDGET_MFLOPS, LATENCY_BUDGET_MS)
+    return create_lightweight_cnn_model(input_shape, num_classes, name=variant,
+                                        **LIGHTWEIGHT_VARIANTS[variant], **kwargs)
+
+def create_transfer_learning_model(input_shape, num_classes, augment=AUGMENT_IN_MODEL, jit_compile=False,
+                                   learning_rate=0.001):
+    """Create a transfer learning model using MobileNetV2, optionally with augmentation layers in front."""
     print("Creating transfer learning model...")
     
     # Load pre-trained MobileNetV2 base model
@@ -67,22 +233,24 @@ def create_transfer_learning_model(input_shape, num_classes):
     
     # Create a new model on top
     inputs = Input(shape=input_shape)
-    x = base_model(inputs, training=False)
+    x = build_augmentation_layers()(inputs) if augment else inputs
+    x = base_model(x, training=False)
     x = GlobalAveragePooling2D()(x)
     x = Dense(512, activation='relu')(x)
     x = Dropout(0.5)(x)
     x = BatchNormalization()(x)
     x = Dense(256, activation='relu')(x)
     x = Dropout(0.3)(x)
-    outputs = Dense(num_classes, activation='softmax')(x)
+    outputs = Dense(num_classes, activation='softmax', dtype='float32')(x)
     
     model = Model(inputs, outputs)
     
     # Compile model
     model.compile(
-        optimizer=Adam(learning_rate=0.001),
+        optimizer=Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=jit_compile
     )
     
     return model, base_model
@@ -1,14 +1,35 @@
 import os
 import json
+import argparse
 from data_utils import prepare_data
-from config import BASE_DIR
+from dataset_state import prepared_settings, save_prepared_settings
+from config import BASE_DIR, TFRECORD_SHARDS, GENERATE_REPORTS
 
 def main():
     """Standalone script to just prepare the data."""
+    # Flags default to the settings of the last preparation (config.py on the first run)
+    settings = prepared_settings()
+    parser = argparse.ArgumentParser(description='Prepare the Oxford 102 Flowers dataset')
+    parser.add_argument('--loader', type=str, choices=['generator', 'tf_data', 'cache', 'tfrecord'], default=settings['loader'],
+                        help='Data loader to prepare for; "cache" writes pre-decoded split memmaps, "tfrecord" writes sharded TFRecords')
+    parser.add_argument('--num-shards', type=int, default=TFRECORD_SHARDS,
+                        help='Number of TFRecord shards per split (with --loader tfrecord)')
+    parser.add_argument('--layout', type=str, choices=['copy', 'link', 'manifest'], default=settings['layout'],
+                        help='How class folders and splits are materialized: copies, hard/symbolic links, or a CSV manifest only')
+    parser.add_argument('--full-extract', action=argparse.BooleanOptionalAction, default=not settings['stream_extract'],
+                        help='Extract the whole archive instead of streaming out only the selected classes')
+    parser.add_argument('--no-report', dest='report', action='store_false', default=GENERATE_REPORTS,
+                        help='Skip saving the augmented-images sample plot')
+    args = parser.parse_args()
+    
     print("Starting data preparation...")
     
     # Prepare data
-    train_generator, validation_generator, test_generator = prepare_data()
+    train_generator, validation_generator, test_generator = prepare_data(
+        args.loader, args.num_shards, args.layout, not args.full_extract, report_plots=args.report
+    )
+    # train_models.py and inference.py read the splits with the loader prepared here
+    save_prepared_settings(loader=args.loader)
     
     # Save class indices to a file for later use with inference
     class_indices = train_generator.class_indices
@@ -0,0 +1,61 @@
+import os
+import csv
+import argparse
+from config import *
+from model_utils import (create_custom_cnn_model, create_lightweight_cnn_model, create_transfer_learning_model,
+                         count_flops, measure_latency, select_lightweight_variant, LIGHTWEIGHT_VARIANTS)
+
+def profile_model(name, model, runs):
+    """Parameter count, forward-pass MFLOPs and CPU latency (batch of 1) of a model."""
+    # Lightweight variants resize IMG_SIZE inputs to their own resolution
+    resolution_multiplier = LIGHTWEIGHT_VARIANTS.get(name, {}).get('resolution_multiplier', 1.0)
+    return {
+        'model': name,
+        'input_size': int(round(IMG_SIZE * resolution_multiplier)),
+        'params': model.count_params(),
+        'mflops': round(count_flops(model) / 1e6, 1),
+        'latency_ms': round(measure_latency(model, runs), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile parameters, FLOPs and CPU latency of the CNN models')
+    parser.add_argument('--runs', type=int, default=30,
+                        help='Timed predictions per model')
+    parser.add_argument('--num-classes', type=int, default=NUM_CLASSES,
+                        help='Number of output classes')
+    parser.add_argument('--max-mflops', type=float, default=FLOP_BUDGET_MFLOPS,
+                        help='FLOP budget for the variant selection')
+    parser.add_argument('--max-latency-ms', type=float, default=LATENCY_BUDGET_MS,
+                        help='Latency budget for the variant selection')
+    args = parser.parse_args()
+
+    input_shape = (IMG_SIZE, IMG_SIZE, 3)
+
+    # Profiled without augmentation layers, which are inactive at inference
+    models = {'baseline': create_custom_cnn_model(input_shape, args.num_classes, augment=False)}
+    for name, params in LIGHTWEIGHT_VARIANTS.items():
+        models[name] = create_lightweight_cnn_model(input_shape, args.num_classes, augment=False, name=name, **params)
+    models['transfer'], _ = create_transfer_learning_model(input_shape, args.num_classes, augment=False)
+
+    rows = []
+    for name, model in models.items():
+        print(f"Profiling {name}...")
+        rows.append(profile_model(name, model, args.runs))
+
+    print(f"\n{'Model':<22}{'Input':>7}{'Params':>12}{'MFLOPs':>10}{'Latency (ms)':>14}")
+    for row in rows:
+        print(f"{row['model']:<22}{row['input_size']:>7}{row['params']:>12,}{row['mflops']:>10}{row['latency_ms']:>14}")
+
+    profile_path = os.path.join(RESULTS_DIR, 'model_profile.csv')
+    with open(profile_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Profile saved to {profile_path}")
+
+    if args.max_mflops is not None or args.max_latency_ms is not None:
+        variant = select_lightweight_variant(input_shape, args.num_classes, args.max_mflops, args.max_latency_ms)
+        print(f'Set CUSTOM_MODEL = "{variant}" in config.py to train it.')
+
+if __name__ == "__main__":
+    main()
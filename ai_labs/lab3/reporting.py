@@ -0,0 +1,166 @@
+# Plots are opt-in: matplotlib and seaborn are imported inside each function,
+# so the data, training and evaluation modules never pay for them unless asked.
+import os
+import numpy as np
+from config import *
+from data_utils import get_sample_batch
+
+def visualize_augmented_images(train_generator):
+    """Visualize sample original and augmented images."""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(16, 8))
+    
+    # Get a batch of images and their labels
+    x_batch, y_batch = get_sample_batch(train_generator)
+    
+    for i in range(min(8, len(x_batch))):
+        plt.subplot(2, 4, i+1)
+        plt.imshow(x_batch[i])
+        class_idx = np.argmax(y_batch[i])
+        class_name = list(train_generator.class_indices.keys())[class_idx]
+        plt.title(f'Class: {class_name}')
+        plt.axis('off')
+    
+    plt.suptitle('Sample Augmented Images')
+    plt.savefig(os.path.join(RESULTS_DIR, 'augmented_images.png'))
+    plt.close()
+
+def plot_training_history(history, model_name="model"):
+    """Plot training history for accuracy and loss."""
+    import matplotlib.pyplot as plt
+    
+    # Accuracy plot
+    plt.figure(figsize=(12, 5))
+    
+    plt.subplot(1, 2, 1)
+    plt.plot(history['accuracy'], label='Training Accuracy')
+    plt.plot(history['val_accuracy'], label='Validation Accuracy')
+    plt.title(f'{model_name} - Accuracy')
+    plt.xlabel('Epoch')
+    plt.ylabel('Accuracy')
+    plt.legend()
+    plt.grid(True)
+    
+    # Loss plot
+    plt.subplot(1, 2, 2)
+    plt.plot(history['loss'], label='Training Loss')
+    plt.plot(history['val_loss'], label='Validation Loss')
+    plt.title(f'{model_name} - Loss')
+    plt.xlabel('Epoch')
+    plt.ylabel('Loss')
+    plt.legend()
+    plt.grid(True)
+    
+    plt.tight_layout()
+    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_history.png'))
+    plt.close()
+
+def plot_confusion_matrix(cm, class_names, model_name):
+    """Plot a confusion matrix heatmap."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
+                xticklabels=class_names,
+                yticklabels=class_names)
+    plt.xlabel('Predicted')
+    plt.ylabel('True')
+    plt.title(f'Confusion Matrix - {model_name}')
+    # Registry keys such as "transfer:int8" are not valid file names everywhere
+    plt.savefig(os.path.join(RESULTS_DIR, f"{model_name.replace(':', '_')}_confusion_matrix.png"))
+    plt.close()
+
+def visualize_predictions(model, test_generator, model_name):
+    """Visualize model predictions on sample test images."""
+    import matplotlib.pyplot as plt
+    
+    # Get the first batch of test images
+    x_batch, y_batch = get_sample_batch(test_generator)
+    
+    # Make predictions
+    preds = model.predict(x_batch)
+    
+    # Plot images with predictions
+    plt.figure(figsize=(16, 12))
+    class_names = list(test_generator.class_indices.keys())
+    
+    for i in range(min(12, len(x_batch))):
+        plt.subplot(3, 4, i+1)
+        plt.imshow(x_batch[i])
+        true_class_idx = np.argmax(y_batch[i])
+        pred_class_idx = np.argmax(preds[i])
+        
+        true_class = class_names[true_class_idx]
+        pred_class = class_names[pred_class_idx]
+        confidence = preds[i][pred_class_idx]
+        
+        color = 'green' if true_class_idx == pred_class_idx else 'red'
+        plt.title(f"True: {true_class}\nPred: {pred_class}\nConf: {confidence:.2f}", 
+                  color=color)
+        plt.axis('off')
+    
+    plt.suptitle(f'{model_name} - Predictions', fontsize=16)
+    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_predictions.png'))
+    plt.close()
+
+def visualize_sample_predictions(x_batch, y_batch, predictions, class_names):
+    """Visualize sample predictions of several models ({name: probabilities}) on the same images."""
+    import matplotlib.pyplot as plt
+    
+    # Plot images with predictions
+    plt.figure(figsize=(15, 10))
+    
+    # Display 6 images
+    for i in range(min(6, len(x_batch))):
+        plt.subplot(2, 3, i+1)
+        plt.imshow(x_batch[i])
+        
+        true_class_idx = np.argmax(y_batch[i])
+        lines = [f"True: {class_names[true_class_idx]}"]
+        for name, preds in predictions.items():
+            pred_idx = np.argmax(preds[i])
+            lines.append(f"{name}: {class_names[pred_idx]} ({preds[i][pred_idx]:.2f})")
+        
+        plt.title("\n".join(lines), fontsize=10)
+        
+        plt.axis('off')
+    
+    plt.suptitle('Sample Predictions Comparison', fontsize=16)
+    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+    plt.savefig(os.path.join(RESULTS_DIR, 'sample_predictions_comparison.png'))
+    plt.close()
+    
+    print(f"Sample predictions comparison saved to {os.path.join(RESULTS_DIR, 'sample_predictions_comparison.png')}")
+
+def plot_model_comparison(models, accuracy, f1_score):
+    """Plot accuracy and macro F1-score of several models side by side."""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(max(10, 2 * len(models)), 6))
+    
+    x = np.arange(len(models))
+    width = 0.35
+    
+    plt.bar(x - width/2, accuracy, width, label='Accuracy')
+    plt.bar(x + width/2, f1_score, width, label='Macro F1-Score')
+    
+    plt.xlabel('Model')
+    plt.ylabel('Score')
+    plt.title('Model Comparison')
+    plt.xticks(x, models)
+    plt.ylim(0, 1)
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    
+    for i, v in enumerate(accuracy):
+        plt.text(i - width/2, v + 0.02, f'{v:.4f}', ha='center')
+    
+    for i, v in enumerate(f1_score):
+        plt.text(i + width/2, v + 0.02, f'{v:.4f}', ha='center')
+    
+    plt.tight_layout()
+    plt.savefig(os.path.join(RESULTS_DIR, 'model_comparison.png'))
+    plt.close()
@@ -0,0 +1,221 @@
+import io
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from config import *
+from inference import load_and_preprocess_image, load_class_indices, get_class_names
+from model_registry import get_registry, default_model_paths
+
+class ServerMetrics:
+    """Thread-safe request counters and a sliding window of request latencies."""
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.latencies = deque(maxlen=window)
+        self.finished = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record_request(self, latency):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.finished.append(time.time())
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batch_sizes.append(size)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            now = time.time()
+            # Requests per second over the last minute (or since the first request)
+            window_start = max(now - 60, self.finished[0]) if self.finished else now
+            recent = sum(1 for finished in self.finished if finished >= window_start)
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'uptime_s': round(now - self.started, 1),
+                'throughput_rps_1m': round(recent / max(now - window_start, 1.0), 2),
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+                'latency_ms_p99': round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+                'mean_batch_size': round(float(np.mean(self.batch_sizes)), 2) if self.batch_sizes else None,
+            }
+
+class MicroBatcher:
+    """Coalesce concurrent single-image requests into batches for one model.
+
+    A worker thread takes the first queued image, then keeps collecting
+    until max_batch images are queued or max_latency_ms has passed since the
+    first one, and predicts them in a single call. The model is fetched from
+    the registry per batch, so it may be evicted and reloaded in between.
+    """
+    def __init__(self, model_key, metrics, max_batch=SERVE_MAX_BATCH, max_latency_ms=SERVE_MAX_LATENCY_MS):
+        self.model_key = model_key
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, image_array):
+        """Queue one preprocessed image (H, W, 3) and return a Future of its probabilities."""
+        future = Future()
+        self.requests.put((image_array, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = np.stack([image_array for image_array, _ in batch])
+            try:
+                model = get_registry().get(self.model_key)
+                predictions = np.asarray(model.predict_on_batch(images))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.metrics.record_batch(len(batch))
+            for (_, future), probs in zip(batch, predictions):
+                future.set_result(probs)
+
+class PredictionServer(ThreadingHTTPServer):
+    """One thread per connection; a deep accept backlog for bursts of concurrent clients."""
+    daemon_threads = True
+    request_queue_size = 128  # The default of 5 resets connections under concurrent load
+
+def make_handler(batchers, class_names, metrics, top_k):
+    """Build the request handler class bound to the loaded models."""
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # Keep-alive connections, so clients are not paying a TCP handshake per image
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/metrics':
+                self._send_json(200, metrics.snapshot())
+            elif path == '/health':
+                self._send_json(200, {'status': 'ok', 'models': list(batchers)})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            """POST /predict?model=<name> with the raw image bytes as the body."""
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if url.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            model_name = parse_qs(url.query).get('model', [next(iter(batchers))])[0]
+            if model_name not in batchers:
+                self._send_json(400, {'error': f"unknown model '{model_name}'", 'models': list(batchers)})
+                return
+
+            try:
+                _, image_array = load_and_preprocess_image(io.BytesIO(body))
+            except Exception as e:
+                metrics.record_error()
+                self._send_json(400, {'error': f"cannot decode image: {e}"})
+                return
+
+            try:
+                probs = batchers[model_name].submit(image_array[0]).result()
+            except Exception as e:
+                metrics.record_error()
+                self._send_json(500, {'error': str(e)})
+                return
+
+            top_indices = np.argsort(probs)[::-1][:top_k]
+            self._send_json(200, {
+                'model': model_name,
+                'prediction': class_names[top_indices[0]],
+                'confidence': float(probs[top_indices[0]]),
+                'top_k': [{'class': class_names[idx], 'probability': float(probs[idx])} for idx in top_indices],
+            })
+            metrics.record_request(time.perf_counter() - start)
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate the CPU at hundreds of requests/sec
+            pass
+
+    return PredictionHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP inference server with dynamic request batching')
+    parser.add_argument('--host', default='0.0.0.0',
+                        help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to listen on')
+    parser.add_argument('--models', nargs='+', choices=list(default_model_paths()), default=['custom', 'transfer'],
+                        help='Models (registry keys, e.g. transfer:int8) to serve; the first is the default for /predict')
+    parser.add_argument('--max-batch', type=int, default=SERVE_MAX_BATCH,
+                        help='Largest micro-batch')
+    parser.add_argument('--max-latency-ms', type=float, default=SERVE_MAX_LATENCY_MS,
+                        help='Longest wait for a micro-batch to fill')
+    parser.add_argument('--top-k', type=int, default=3,
+                        help='Number of top classes returned per image')
+    args = parser.parse_args()
+
+    class_names = get_class_names(load_class_indices())
+    metrics = ServerMetrics()
+
+    # Models are loaded (and their predict function traced) once, before accepting requests
+    batchers = {}
+    for name in args.models:
+        try:
+            model = get_registry().get(name)
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            return
+        model.predict_on_batch(np.zeros((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32))
+        batchers[name] = MicroBatcher(name, metrics, args.max_batch, args.max_latency_ms)
+
+    handler = make_handler(batchers, class_names, metrics, min(args.top_k, len(class_names)))
+    server = PredictionServer((args.host, args.port), handler)
+    print(f"Serving {list(batchers)} on http://{args.host}:{args.port} "
+          f"(POST /predict?model=<name>, GET /metrics, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import numpy as np
+
+def report_from_confusion(cm, class_names):
+    """Build the classification_report(output_dict=True) dict from a confusion matrix (rows: true classes)."""
+    cm = np.asarray(cm, dtype=np.float64)
+    true_positives = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    # Undefined ratios are reported as 0, like sklearn's default zero_division
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(true_positives),
+                   where=(precision + recall) > 0)
+
+    report = {}
+    for idx, name in enumerate(class_names):
+        report[name] = {'precision': float(precision[idx]), 'recall': float(recall[idx]),
+                        'f1-score': float(f1[idx]), 'support': float(support[idx])}
+    report['accuracy'] = float(true_positives.sum() / max(cm.sum(), 1))
+
+    total = max(support.sum(), 1)
+    for average, weights in (('macro avg', np.full(len(class_names), 1 / len(class_names))),
+                             ('weighted avg', support / total)):
+        report[average] = {'precision': float(precision @ weights), 'recall': float(recall @ weights),
+                           'f1-score': float(f1 @ weights), 'support': float(support.sum())}
+    return report
+
+class StreamingMetrics:
+    """Classification metrics accumulated batch by batch in constant memory.
+
+    Keeps a confusion matrix, top-k hit counts and confidence-binned
+    calibration sums; no per-sample predictions are stored, so the test set
+    can be arbitrarily large.
+    """
+    def __init__(self, class_names, top_k=(1, 3, 5), num_bins=10):
+        self.class_names = list(class_names)
+        num_classes = len(self.class_names)
+        self.top_k = tuple(k for k in top_k if k <= num_classes)
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.top_k_hits = dict.fromkeys(self.top_k, 0)
+        self.bin_edges = np.linspace(0, 1, num_bins + 1)
+        self.bin_counts = np.zeros(num_bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(num_bins)
+        self.bin_correct = np.zeros(num_bins)
+
+    @property
+    def count(self):
+        return int(self.confusion.sum())
+
+    def update(self, labels, probabilities):
+        """Add a batch: labels as class indices or one-hot rows, probabilities of shape (batch, classes)."""
+        labels = np.asarray(labels)
+        if labels.ndim == 2:
+            labels = np.argmax(labels, axis=1)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        predicted = np.argmax(probabilities, axis=1)
+
+        np.add.at(self.confusion, (labels, predicted), 1)
+
+        # Rank of the true class: number of classes scored strictly higher
+        true_scores = probabilities[np.arange(len(labels)), labels]
+        rank = np.sum(probabilities > true_scores[:, np.newaxis], axis=1)
+        for k in self.top_k:
+            self.top_k_hits[k] += int(np.sum(rank < k))
+
+        confidence = probabilities[np.arange(len(labels)), predicted]
+        bins = np.clip(np.digitize(confidence, self.bin_edges[1:-1]), 0, len(self.bin_counts) - 1)
+        np.add.at(self.bin_counts, bins, 1)
+        np.add.at(self.bin_confidence, bins, confidence)
+        np.add.at(self.bin_correct, bins, (predicted == labels).astype(np.float64))
+
+    def accuracy(self):
+        return float(np.trace(self.confusion) / max(self.count, 1))
+
+    def top_k_accuracy(self):
+        """{k: fraction of samples whose true class is among the k highest scores}."""
+        return {k: hits / max(self.count, 1) for k, hits in self.top_k_hits.items()}
+
+    def calibration(self):
+        """Reliability bins (confidence range, count, mean confidence, accuracy) and the expected calibration error."""
+        bins = []
+        ece = 0.0
+        for idx, count in enumerate(self.bin_counts):
+            if count == 0:
+                continue
+            confidence = self.bin_confidence[idx] / count
+            accuracy = self.bin_correct[idx] / count
+            ece += count / max(self.count, 1) * abs(accuracy - confidence)
+            bins.append({
+                'range': (float(self.bin_edges[idx]), float(self.bin_edges[idx + 1])),
+                'count': int(count),
+                'confidence': float(confidence),
+                'accuracy': float(accuracy),
+            })
+        return {'bins': bins, 'ece': float(ece)}
+
+    def report(self):
+        """Per-class precision/recall/F1 in the classification_report(output_dict=True) layout."""
+        return report_from_confusion(self.confusion, self.class_names)
+
+    def summary(self):
+        """One-line progress summary."""
+        parts = [f"{self.count} images", f"accuracy={self.accuracy():.4f}"]
+        parts += [f"top{k}={value:.4f}" for k, value in self.top_k_accuracy().items() if k > 1]
+        parts.append(f"ECE={self.calibration()['ece']:.4f}")
+        return ", ".join(parts)
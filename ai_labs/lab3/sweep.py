@@ -0,0 +1,160 @@
+import os
+import csv
+import time
+import random
+import argparse
+import multiprocessing
+import numpy as np
+from config import *
+
+# Values sampled for each trial
+SWEEP_SPACE = {
+    'model': ['custom', 'transfer'],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+    'batch_size': [16, 32, 64],
+    'img_size': [128, 160, 224],
+}
+
+def sample_trials(num_trials, space=SWEEP_SPACE, seed=42):
+    """Draw distinct random configurations from the search space."""
+    rng = random.Random(seed)
+    total = int(np.prod([len(values) for values in space.values()]))
+    trials = []
+    while len(trials) < min(num_trials, total):
+        params = {name: rng.choice(values) for name, values in space.items()}
+        if params not in trials:
+            trials.append(params)
+    return trials
+
+def median_prune(reports, trial_id, epoch, warmup_epochs, min_trials):
+    """Median stopping rule: prune when this trial's best accuracy so far is below the median of
+    the other trials' best accuracy at the same epoch."""
+    if epoch < warmup_epochs:
+        return False
+
+    others = [
+        max(values[:epoch + 1])
+        for other_id, values in reports.items()
+        if other_id != trial_id and len(values) > epoch
+    ]
+    if len(others) < min_trials:
+        return False
+
+    return max(reports[trial_id][:epoch + 1]) < np.median(others)
+
+def run_trial(trial_id, params, epochs, reports, threads, warmup_epochs, min_trials):
+    """Train one configuration on the shared cache, reporting val_accuracy after every epoch."""
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+    from tensorflow.keras.callbacks import Callback, EarlyStopping
+    from data_utils import create_cached_dataset
+    from model_utils import create_custom_cnn_model, create_transfer_learning_model
+
+    class MedianPruning(Callback):
+        """Publish val_accuracy to the shared report table and stop the trial if it is pruned."""
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            reports[trial_id] = reports[trial_id] + [float(logs['val_accuracy'])]
+            if median_prune(dict(reports), trial_id, epoch, warmup_epochs, min_trials):
+                print(f"Trial {trial_id}: pruned after epoch {epoch + 1}.")
+                self.pruned = True
+                self.model.stop_training = True
+
+    augment = not AUGMENT_IN_MODEL
+    img_size, batch_size = params['img_size'], params['batch_size']
+    train_data = create_cached_dataset(os.path.join(BASE_DIR, "train"), batch_size, training=True,
+                                       augment=augment, img_size=img_size)
+    validation_data = create_cached_dataset(os.path.join(BASE_DIR, "validation"), batch_size,
+                                            img_size=img_size)
+
+    input_shape = (img_size, img_size, 3)
+    num_classes = len(train_data.class_indices)
+    if params['model'] == 'custom':
+        model = create_custom_cnn_model(input_shape, num_classes, learning_rate=params['learning_rate'])
+    else:
+        # Transfer trials tune the frozen-base phase (phase 1)
+        model, _ = create_transfer_learning_model(input_shape, num_classes, learning_rate=params['learning_rate'])
+
+    pruning = MedianPruning()
+    early_stopping = EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)
+
+    start = time.perf_counter()
+    history = model.fit(
+        train_data,
+        epochs=epochs,
+        validation_data=validation_data,
+        callbacks=[pruning, early_stopping],
+        verbose=0
+    )
+
+    return {
+        'trial': trial_id,
+        **params,
+        'status': 'pruned' if pruning.pruned else 'completed',
+        'epochs': len(history.history['loss']),
+        'best_val_accuracy': max(history.history['val_accuracy']),
+        'best_val_loss': min(history.history['val_loss']),
+        'seconds': round(time.perf_counter() - start, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Random-search hyperparameter sweep with parallel trials and median pruning')
+    parser.add_argument('--trials', type=int, default=12,
+                        help='Number of configurations to try')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 8),
+                        help='Trials trained concurrently')
+    parser.add_argument('--epochs', type=int, default=EPOCHS,
+                        help='Maximum epochs per trial')
+    parser.add_argument('--warmup-epochs', type=int, default=2,
+                        help='Epochs before a trial can be pruned')
+    parser.add_argument('--min-trials', type=int, default=3,
+                        help='Other trials that must have reached an epoch before pruning against it')
+    args = parser.parse_args()
+
+    # Trials share one pre-decoded cache, built once here; they resize batches to their own img_size
+    from data_utils import cache_splits
+    cache_splits(*(os.path.join(BASE_DIR, split) for split in ('train', 'validation', 'test')))
+
+    trials = sample_trials(args.trials)
+    if any(params['model'] == 'transfer' for params in trials):
+        # Fetch the ImageNet weights once instead of in every worker
+        from tensorflow.keras.applications import MobileNetV2
+        MobileNetV2(weights='imagenet', include_top=False)
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"Running {len(trials)} trials on {args.workers} workers ({threads} threads each)...")
+
+    # TensorFlow is not fork-safe, so trials run in freshly spawned processes
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        reports = manager.dict({trial_id: [] for trial_id in range(len(trials))})
+        with context.Pool(args.workers) as pool:
+            pending = [
+                pool.apply_async(run_trial, (trial_id, params, args.epochs, reports, threads,
+                                             args.warmup_epochs, args.min_trials))
+                for trial_id, params in enumerate(trials)
+            ]
+            results = []
+            for job in pending:
+                result = job.get()
+                print(f"Trial {result['trial']} {result['status']}: val_accuracy={result['best_val_accuracy']:.4f} "
+                      f"({result['epochs']} epochs, {result['seconds']}s) {trials[result['trial']]}")
+                results.append(result)
+
+    results.sort(key=lambda result: result['best_val_accuracy'], reverse=True)
+    results_path = os.path.join(RESULTS_DIR, 'sweep_results.csv')
+    with open(results_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"\nBest configuration: {trials[results[0]['trial']]} "
+          f"(val_accuracy={results[0]['best_val_accuracy']:.4f})")
+    print(f"Results saved to {results_path}")
+
+if __name__ == "__main__":
+    main()
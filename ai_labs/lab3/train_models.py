@@ -1,15 +1,58 @@
 import os
 import sys
+import argparse
+import contextlib
 import tensorflow as tf
+from tensorflow.keras.applications import MobileNetV2
 from config import *
-from data_utils import prepare_data
-from model_utils import create_custom_cnn_model, create_transfer_learning_model
-from training_utils import train_custom_model, train_transfer_learning_model, plot_training_history
+from data_utils import prepare_data, create_data_generators
+from dataset_state import prepared_settings
+from model_utils import create_custom_model, create_transfer_learning_model
+from training_utils import train_custom_model, train_transfer_learning_model, apply_training_profile
 from evaluation_utils import evaluate_model, compare_models
+from checkpoint_utils import begin_training_run, clear_training_state
+from distributed_utils import launch_workers, create_worker_strategy, is_chief
+
+def evaluation_model(model, strategy, filename):
+    """The model to evaluate: itself, or after data-parallel training its saved copy outside the worker cluster."""
+    if strategy is None:
+        return model
+    return tf.keras.models.load_model(os.path.join(MODEL_DIR, filename))
 
 def main():
     """Main function to train and evaluate models."""
+    parser = argparse.ArgumentParser(description='Train and evaluate the flower classification models')
+    parser.add_argument('--no-report', dest='report', action='store_false', default=GENERATE_REPORTS,
+                        help='Skip plots (training curves, confusion matrices, sample predictions)')
+    parser.add_argument('--profile', choices=['default', 'fast'], default=TRAINING_PROFILE,
+                        help='Training profile: float32, or mixed bfloat16 + XLA + tuned thread pools')
+    parser.add_argument('--progressive', action='store_true', default=PROGRESSIVE_RESIZING,
+                        help=f'Progressive resizing: train at {PROGRESSIVE_SIZES} px in turn, from the pre-decoded cache')
+    parser.add_argument('--no-resume', dest='resume', action='store_false', default=RESUME_TRAINING,
+                        help='Start from scratch instead of resuming an interrupted run')
+    parser.add_argument('--workers', type=int, default=TRAINING_WORKERS,
+                        help='Train data-parallel in this many local worker processes (MultiWorkerMirroredStrategy); '
+                             'BATCH_SIZE is per worker and the learning rates are multiplied by the worker count')
+    parser.add_argument('--worker-index', type=int, help=argparse.SUPPRESS)  # Set by the launcher for each worker
+    args = parser.parse_args()
+    if args.workers > 1:
+        if args.progressive or FEATURE_CACHE or ACTIVATION_CACHE:
+            parser.error("--workers cannot be combined with --progressive, FEATURE_CACHE or ACTIVATION_CACHE")
+        if CUSTOM_MODEL == "budget" and LATENCY_BUDGET_MS is not None:
+            parser.error("--workers needs a CUSTOM_MODEL variant instead of a latency budget, "
+                         "which every worker would measure for itself")
+    
     print("Starting the CNN lab training workflow...")
+    loader = prepared_settings()['loader']
+    if args.workers > 1 and args.worker_index is None:
+        # Prepare the data once, then train in the worker processes; they start from scratch
+        prepare_data(loader, report_plots=args.report)
+        # Fetch the ImageNet weights here rather than in every worker into the same cache file
+        MobileNetV2(weights='imagenet', include_top=False, input_shape=(IMG_SIZE, IMG_SIZE, 3))
+        clear_training_state()
+        sys.exit(launch_workers(args.workers, [sys.executable, os.path.abspath(__file__)] + sys.argv[1:]))
+    
+    jit_compile = apply_training_profile(args.profile, workers=args.workers)
     
     # Check for GPU
     gpus = tf.config.list_physical_devices('GPU')
@@ -20,32 +63,84 @@ def main():
             tf.config.experimental.set_memory_growth(gpu, True)
     else:
         print("No GPU found. Training on CPU.")
-        
+    
     # Prepare data
-    train_generator, validation_generator, test_generator = prepare_data()
+    if args.worker_index is None:
+        strategy = None
+        train_generator, validation_generator, test_generator = prepare_data(loader, report_plots=args.report)
+    else:
+        # Each worker reads its own shard of the training and validation splits prepared by the launcher
+        strategy = create_worker_strategy()
+        train_generator, validation_generator, test_generator = create_data_generators(
+            os.path.join(BASE_DIR, "train"), os.path.join(BASE_DIR, "validation"), os.path.join(BASE_DIR, "test"),
+            loader, shard=(args.workers, args.worker_index)
+        )
+    chief = strategy is None or is_chief(strategy)
+    # Linear scaling: each step averages the gradients of BATCH_SIZE images per worker
+    lr_scale = strategy.num_replicas_in_sync if strategy is not None else 1
     
     # Get the number of classes from the generator
     num_classes = len(train_generator.class_indices)
     input_shape = (IMG_SIZE, IMG_SIZE, 3)
     
+    # Progressive resizing feeds several resolutions to one model, so it is built with a flexible input.
+    # The baseline CNN's Flatten head is tied to IMG_SIZE and always trains at full resolution
+    custom_progressive = args.progressive and CUSTOM_MODEL != "baseline"
+    custom_shape = (None, None, 3) if custom_progressive else input_shape
+    transfer_shape = (None, None, 3) if args.progressive else input_shape
+    
+    # Checkpoints of an interrupted run are only reused with the same settings;
+    # data-parallel runs train without them
+    resume = args.resume and strategy is None
+    if resume:
+        begin_training_run({
+            'img_size': IMG_SIZE, 'batch_size': BATCH_SIZE, 'epochs': EPOCHS, 'num_classes': num_classes,
+            'profile': args.profile, 'loader': loader, 'custom_model': CUSTOM_MODEL,
+            'progressive': args.progressive,
+            'augment_in_model': AUGMENT_IN_MODEL, 'feature_cache': FEATURE_CACHE, 'activation_cache': ACTIVATION_CACHE,
+        })
+    elif strategy is None:
+        clear_training_state()
+    
     # Train custom CNN
     print("\n=== Training Custom CNN Model ===")
-    custom_model = create_custom_cnn_model(input_shape, num_classes)
+    with strategy.scope() if strategy is not None else contextlib.nullcontext():
+        custom_model = create_custom_model(custom_shape, num_classes, jit_compile=jit_compile,
+                                           learning_rate=0.001 * lr_scale)
     print(custom_model.summary())
-    custom_history = train_custom_model(custom_model, train_generator, validation_generator)
-    plot_training_history(custom_history.history, "Custom CNN")
-    custom_results = evaluate_model(custom_model, test_generator, "Custom CNN")
+    custom_history = train_custom_model(custom_model, train_generator, validation_generator, resume=resume,
+                                        progressive=custom_progressive, strategy=strategy)
+    if chief:
+        if args.report:
+            from reporting import plot_training_history
+            plot_training_history(custom_history.history, "Custom CNN")
+        custom_results = evaluate_model(evaluation_model(custom_model, strategy, 'final_custom_model.keras'),
+                                        test_generator, "Custom CNN", report_plots=args.report)
     
     # Train transfer learning model
     print("\n=== Training Transfer Learning Model ===")
-    transfer_model, base_model = create_transfer_learning_model(input_shape, num_classes)
+    with strategy.scope() if strategy is not None else contextlib.nullcontext():
+        transfer_model, base_model = create_transfer_learning_model(transfer_shape, num_classes,
+                                                                    jit_compile=jit_compile,
+                                                                    learning_rate=0.001 * lr_scale)
     print(transfer_model.summary())
-    transfer_history = train_transfer_learning_model(transfer_model, base_model, train_generator, validation_generator)
-    plot_training_history(transfer_history, "Transfer Learning")
-    transfer_results = evaluate_model(transfer_model, test_generator, "Transfer Learning")
+    transfer_history = train_transfer_learning_model(transfer_model, base_model, train_generator, validation_generator,
+                                                     fine_tune_learning_rate=0.0001 * lr_scale, resume=resume,
+                                                     progressive=args.progressive, strategy=strategy)
+    if not chief:
+        print("\nWorker finished training.")
+        return
+    if args.report:
+        from reporting import plot_training_history
+        plot_training_history(transfer_history, "Transfer Learning")
+    transfer_results = evaluate_model(evaluation_model(transfer_model, strategy, 'final_transfer_model.keras'),
+                                      test_generator, "Transfer Learning", report_plots=args.report)
     
     # Compare models
-    compare_models(custom_results, transfer_results)
+    compare_models(custom_results, transfer_results, report_plots=args.report)
+    
+    # The run is complete; the next one starts from scratch
+    clear_training_state()
     
     print("\nTraining and evaluation completed successfully.")
     print(f"Models saved in: {MODEL_DIR}")
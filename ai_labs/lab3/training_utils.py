@@ -1,11 +1,133 @@
 import os
-import matplotlib.pyplot as plt
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping
+import contextlib
+import tensorflow as tf
+from tensorflow.keras import mixed_precision
+from tensorflow.keras.models import Sequential, Model
+from tensorflow.keras.layers import Input, GlobalAveragePooling2D
+from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, History
 from tensorflow.keras.optimizers import Adam  # Add this import for the Adam optimizer
 from config import *
+from data_utils import create_cached_dataset
+from feature_cache import cache_features, cached_pass_dataset
+from checkpoint_utils import fit_resumable, complete_stage, restore_completed_stage
+from distributed_utils import fit_distributed, is_chief
 
-def train_custom_model(model, train_generator, validation_generator):
-    """Train the custom CNN model."""
+def supports_bfloat16():
+    """Whether the training device has native bfloat16 math (Ampere+ GPU, or AVX512-BF16/AMX CPU)."""
+    gpus = tf.config.list_physical_devices('GPU')
+    if gpus:
+        details = tf.config.experimental.get_device_details(gpus[0])
+        return details.get('compute_capability', (0, 0)) >= (8, 0)
+    
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu_flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in cpu_flags or 'amx_bf16' in cpu_flags
+
+def apply_training_profile(profile=TRAINING_PROFILE, workers=1):
+    """Configure precision and thread pools for a training profile and return the jit_compile flag.
+    
+    Must run before TensorFlow executes any op, since the thread pools are fixed afterwards.
+    With several local data-parallel workers, each gets an equal share of the
+    cores (unless INTRA_OP_THREADS is set), and the distributed training step
+    is not XLA-compiled.
+    """
+    intra_threads = INTRA_OP_THREADS or max(1, os.cpu_count() // workers)
+    if workers > 1:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+        except RuntimeError:
+            print("TensorFlow is already initialized; keeping the current thread pools.")
+    if profile == "default":
+        return False
+    
+    print(f"Applying '{profile}' training profile...")
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(INTER_OP_THREADS)
+        print(f"Thread pools: {intra_threads} intra-op, {INTER_OP_THREADS} inter-op.")
+    except RuntimeError:
+        print("TensorFlow is already initialized; keeping the current thread pools.")
+    
+    if supports_bfloat16():
+        mixed_precision.set_global_policy('mixed_bfloat16')
+        print("Using mixed_bfloat16 precision.")
+    else:
+        print("No native bfloat16 support; keeping float32.")
+    
+    # XLA JIT compilation of the train/predict steps
+    return workers == 1
+
+def progressive_schedule(epochs, sizes=PROGRESSIVE_SIZES):
+    """Split epochs evenly over the training resolutions as (img_size, first_epoch, end_epoch) stages.
+    
+    The final (full) resolution always gets at least one epoch; with fewer
+    epochs than sizes, the smaller sizes that do not fit are skipped.
+    """
+    per_size = max(1, epochs // len(sizes))
+    schedule = []
+    start = 0
+    for idx, size in enumerate(sizes):
+        # The final resolution takes the remaining epochs, and at least the last one
+        end = epochs if idx == len(sizes) - 1 else max(start, min(epochs - 1, start + per_size))
+        if end > start:
+            schedule.append((size, start, end))
+        start = end
+    return schedule
+
+def fit_progressive(model, stage, validation_data, model_checkpoint, early_stopping, epochs,
+                    batch_size=BATCH_SIZE, resume=RESUME_TRAINING):
+    """Train at increasing resolutions, rebuilding the training loader from the pre-decoded cache for each.
+    
+    The model needs a (None, None, 3) input. Validation stays at IMG_SIZE, so
+    val_loss (checkpointing, early stopping) is comparable across resolutions;
+    an early stop ends the current resolution. With resume, every resolution is
+    a stage of its own.
+    """
+    if model.input_shape[1] is not None:
+        raise ValueError("Progressive resizing needs a model built with input_shape (None, None, 3).")
+    
+    train_dir = os.path.join(BASE_DIR, "train")
+    history = History()
+    history.history = {}
+    for size, first_epoch, end_epoch in progressive_schedule(epochs):
+        size_stage = f"{stage}_{size}px"
+        size_history = restore_completed_stage(size_stage, model) if resume else None
+        if size_history is None:
+            print(f"Training at {size}x{size} (epochs {first_epoch + 1}-{end_epoch})...")
+            train_data = create_cached_dataset(train_dir, batch_size, training=True,
+                                               augment=not AUGMENT_IN_MODEL, img_size=size)
+            fit_kwargs = dict(initial_epoch=first_epoch, epochs=end_epoch, validation_data=validation_data, verbose=1)
+            if resume:
+                size_history = fit_resumable(model, size_stage, train_data, model_checkpoint, early_stopping,
+                                             **fit_kwargs)
+                complete_stage(size_stage, model, size_history)
+            else:
+                size_history = model.fit(train_data, callbacks=[model_checkpoint, early_stopping], **fit_kwargs)
+        
+        for key, values in size_history.history.items():
+            history.history.setdefault(key, []).extend(values)
+    
+    return history
+
+def train_custom_model(model, train_generator, validation_generator, resume=RESUME_TRAINING,
+                       progressive=PROGRESSIVE_RESIZING, batch_size=BATCH_SIZE, strategy=None):
+    """Train the custom CNN model.
+    
+    With resume, training is checkpointed every epoch and continues where an
+    interrupted run (see checkpoint_utils.begin_training_run) stopped. With
+    progressive, the training loader is rebuilt at each PROGRESSIVE_SIZES
+    resolution (see fit_progressive) instead of using train_generator. With a
+    MultiWorkerMirroredStrategy, the model (built in its scope) trains on this
+    worker's data shard with fit_distributed; only the chief saves it.
+    """
+    if resume:
+        history = restore_completed_stage('custom', model)
+        if history is not None:
+            return history
+    
     print("Training custom CNN model...")
     
     # Callbacks
@@ -25,21 +147,165 @@ def train_custom_model(model, train_generator, validation_generator):
     )
     
     # Train model
-    history = model.fit(
-        train_generator,
-        epochs=EPOCHS,
-        validation_data=validation_generator,
-        callbacks=[model_checkpoint, early_stopping],
-        verbose=1
-    )
+    if progressive:
+        history = fit_progressive(model, 'custom', validation_generator, model_checkpoint, early_stopping,
+                                  epochs=EPOCHS, batch_size=batch_size, resume=resume)
+    elif strategy is not None:
+        history = fit_distributed(model, strategy, train_generator, validation_generator, epochs=EPOCHS,
+                                  callbacks=[model_checkpoint, early_stopping], batch_size=batch_size)
+    elif resume:
+        history = fit_resumable(
+            model, 'custom', train_generator, model_checkpoint, early_stopping,
+            epochs=EPOCHS,
+            validation_data=validation_generator,
+            verbose=1
+        )
+    else:
+        history = model.fit(
+            train_generator,
+            epochs=EPOCHS,
+            validation_data=validation_generator,
+            callbacks=[model_checkpoint, early_stopping],
+            verbose=1
+        )
     
     # Save final model
-    model.save(os.path.join(MODEL_DIR, 'final_custom_model.keras'))
+    if strategy is None or is_chief(strategy):
+        model.save(os.path.join(MODEL_DIR, 'final_custom_model.keras'))
+    if resume:
+        complete_stage('custom', model, history)
+    
+    return history
+
+def train_head_on_features(model, base_model, train_generator, validation_generator, learning_rate=0.001,
+                           passes=FEATURE_CACHE_PASSES, epochs=10, batch_size=BATCH_SIZE):
+    """Phase 1 on cached features: run the frozen base once per (image, augmentation pass), then fit only the head.
+    
+    The head layers are shared with the full model, so its weights are trained in place.
+    """
+    layer_names = [layer.name for layer in model.layers]
+    augmentation = model.get_layer('augmentation') if 'augmentation' in layer_names else None
+    
+    # Frozen backbone + pooling, and the head that follows the pooling layer in the full model
+    extractor = Sequential([base_model, GlobalAveragePooling2D()])
+    head_layers = model.layers[layer_names.index(base_model.name) + 2:]
+    
+    cache_key = {'base': base_model.name, 'input_shape': list(base_model.input_shape[1:]),
+                 'in_model_augmentation': augmentation is not None}
+    train_features, train_labels = cache_features(
+        extractor, train_generator, 'train', passes=passes,
+        augmentation=augmentation, extra_key=cache_key
+    )
+    val_features, val_labels = cache_features(
+        extractor, validation_generator, 'validation', extra_key=cache_key
+    )
+    
+    head_inputs = Input(shape=train_features.shape[1:])
+    x = head_inputs
+    for layer in head_layers:
+        x = layer(x)
+    head = Model(head_inputs, x)
+    
+    history = fit_on_cached(head, (train_features, train_labels), (val_features, val_labels),
+                            learning_rate=learning_rate, epochs=epochs, passes=passes, batch_size=batch_size,
+                            jit_compile=model.jit_compile)
+    
+    # Same checkpoint as the regular phase 1, holding the best head weights
+    model.save(os.path.join(MODEL_DIR, 'best_transfer_model_phase1.keras'))
+    
+    return history
+
+def fine_tune_on_activations(model, base_model, train_generator, validation_generator, learning_rate=0.0001,
+                             passes=FEATURE_CACHE_PASSES, epochs=10, batch_size=BATCH_SIZE):
+    """Phase 2 on cached activations: run the frozen prefix of the base once, then train the suffix and head.
+    
+    The base is split after PREFIX_CUT_LAYER, whose single output tensor is
+    cached per (image, augmentation pass). The suffix holds every unfrozen layer
+    and shares its weights with the full model.
+    """
+    layer_names = [layer.name for layer in model.layers]
+    augmentation = model.get_layer('augmentation') if 'augmentation' in layer_names else None
+    
+    cut = base_model.get_layer(PREFIX_CUT_LAYER).output
+    prefix = Model(base_model.input, cut)
+    suffix = Model(cut, base_model.output)
+    if any(layer.trainable_weights for layer in prefix.layers):
+        raise ValueError(f"Layers before {PREFIX_CUT_LAYER} are trainable; move the cut earlier.")
+    head_layers = model.layers[layer_names.index(base_model.name) + 1:]
+    
+    cache_key = {'base': base_model.name, 'input_shape': list(base_model.input_shape[1:]),
+                 'cut': PREFIX_CUT_LAYER, 'in_model_augmentation': augmentation is not None}
+    train_activations, train_labels = cache_features(
+        prefix, train_generator, 'train_prefix', passes=passes,
+        augmentation=augmentation, extra_key=cache_key
+    )
+    val_activations, val_labels = cache_features(
+        prefix, validation_generator, 'validation_prefix', extra_key=cache_key
+    )
+    
+    # Same inference-mode BatchNorm as the full model, which calls the base with training=False
+    inputs = Input(shape=train_activations.shape[1:])
+    x = suffix(inputs, training=False)
+    for layer in head_layers:
+        x = layer(x)
+    trainer = Model(inputs, x)
+    
+    history = fit_on_cached(trainer, (train_activations, train_labels), (val_activations, val_labels),
+                            learning_rate=learning_rate, epochs=epochs, passes=passes, batch_size=batch_size,
+                            jit_compile=model.jit_compile)
+    
+    # Same checkpoint as the regular phase 2, holding the best suffix and head weights
+    model.save(os.path.join(MODEL_DIR, 'best_transfer_model_phase2.keras'))
     
     return history
 
-def train_transfer_learning_model(model, base_model, train_generator, validation_generator):
-    """Train the transfer learning model in two phases."""
+def fit_on_cached(trainer, train_arrays, validation_arrays, learning_rate, epochs, passes=1, batch_size=BATCH_SIZE,
+                  jit_compile=False):
+    """Compile and fit a model on cached (inputs, labels) arrays, keeping the best weights by val_loss.
+    
+    The training arrays hold `passes` augmentation passes; each epoch trains on
+    one of them, so epochs and early-stopping patience keep their usual meaning.
+    """
+    trainer.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
+    
+    early_stopping = EarlyStopping(
+        monitor='val_loss',
+        patience=5,
+        verbose=1,
+        restore_best_weights=True
+    )
+    
+    train_dataset, steps_per_epoch = cached_pass_dataset(*train_arrays, passes=passes, batch_size=batch_size,
+                                                         training=True)
+    validation_dataset, _ = cached_pass_dataset(*validation_arrays, batch_size=batch_size)
+    return trainer.fit(
+        train_dataset,
+        steps_per_epoch=steps_per_epoch,
+        epochs=epochs,
+        validation_data=validation_dataset,
+        callbacks=[early_stopping],
+        verbose=1
+    )
+
+def train_transfer_learning_model(model, base_model, train_generator, validation_generator,
+                                  feature_cache=FEATURE_CACHE, fine_tune_learning_rate=0.0001,
+                                  resume=RESUME_TRAINING, activation_cache=ACTIVATION_CACHE,
+                                  progressive=PROGRESSIVE_RESIZING, batch_size=BATCH_SIZE, strategy=None):
+    """Train the transfer learning model in two phases.
+    
+    With feature_cache, phase 1 trains the head on cached frozen-base features;
+    with activation_cache, phase 2 trains the unfrozen layers on cached
+    activations of the frozen part of the base. Otherwise, with progressive,
+    each phase ramps up the training resolution (see fit_progressive), and
+    with a strategy both phases run data-parallel (see train_custom_model).
+    With resume, each phase is checkpointed and an interrupted run continues
+    in the phase (and epoch) where it stopped.
+    """
     print("Training transfer learning model...")
     
     # Phase 1: Train only the top layers
@@ -62,13 +328,36 @@ def train_transfer_learning_model(model, base_model, train_generator, validation
     )
     
     # Train model (phase 1)
-    history1 = model.fit(
-        train_generator,
-        epochs=10,
-        validation_data=validation_generator,
-        callbacks=[model_checkpoint, early_stopping],
-        verbose=1
-    )
+    history1 = restore_completed_stage('transfer_phase1', model) if resume else None
+    if history1 is None:
+        if feature_cache:
+            # The head trains at the learning rate the model was compiled with
+            history1 = train_head_on_features(model, base_model, train_generator, validation_generator,
+                                              learning_rate=float(model.optimizer.learning_rate.numpy()),
+                                              batch_size=batch_size)
+        elif progressive:
+            history1 = fit_progressive(model, 'transfer_phase1', validation_generator, model_checkpoint,
+                                       early_stopping, epochs=10, batch_size=batch_size, resume=resume)
+        elif strategy is not None:
+            history1 = fit_distributed(model, strategy, train_generator, validation_generator, epochs=10,
+                                          callbacks=[model_checkpoint, early_stopping], batch_size=batch_size)
+        elif resume:
+            history1 = fit_resumable(
+                model, 'transfer_phase1', train_generator, model_checkpoint, early_stopping,
+                epochs=10,
+                validation_data=validation_generator,
+                verbose=1
+            )
+        else:
+            history1 = model.fit(
+                train_generator,
+                epochs=10,
+                validation_data=validation_generator,
+                callbacks=[model_checkpoint, early_stopping],
+                verbose=1
+            )
+        if resume:
+            complete_stage('transfer_phase1', model, history1)
     
     # Phase 2: Fine-tuning - unfreeze some layers of the base model
     print("Phase 2: Fine-tuning...")
@@ -79,11 +368,13 @@ def train_transfer_learning_model(model, base_model, train_generator, validation
         layer.trainable = False
     
     # Recompile model with a lower learning rate
-    model.compile(
-        optimizer=Adam(learning_rate=0.0001),  # Now Adam will be properly recognized
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
+    with strategy.scope() if strategy is not None else contextlib.nullcontext():
+        model.compile(
+            optimizer=Adam(learning_rate=fine_tune_learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            jit_compile=model.jit_compile
+        )
     
     # Callbacks for phase 2
     model_checkpoint = ModelCheckpoint(
@@ -95,16 +386,38 @@ def train_transfer_learning_model(model, base_model, train_generator, validation
     )
     
     # Train model (phase 2)
-    history2 = model.fit(
-        train_generator,
-        epochs=10,
-        validation_data=validation_generator,
-        callbacks=[model_checkpoint, early_stopping],
-        verbose=1
-    )
+    history2 = restore_completed_stage('transfer_phase2', model) if resume else None
+    if history2 is None:
+        if activation_cache:
+            history2 = fine_tune_on_activations(model, base_model, train_generator, validation_generator,
+                                                learning_rate=fine_tune_learning_rate, batch_size=batch_size)
+        elif progressive:
+            history2 = fit_progressive(model, 'transfer_phase2', validation_generator, model_checkpoint,
+                                       early_stopping, epochs=10, batch_size=batch_size, resume=resume)
+        elif strategy is not None:
+            history2 = fit_distributed(model, strategy, train_generator, validation_generator, epochs=10,
+                                          callbacks=[model_checkpoint, early_stopping], batch_size=batch_size)
+        elif resume:
+            history2 = fit_resumable(
+                model, 'transfer_phase2', train_generator, model_checkpoint, early_stopping,
+                epochs=10,
+                validation_data=validation_generator,
+                verbose=1
+            )
+        else:
+            history2 = model.fit(
+                train_generator,
+                epochs=10,
+                validation_data=validation_generator,
+                callbacks=[model_checkpoint, early_stopping],
+                verbose=1
+            )
+        if resume:
+            complete_stage('transfer_phase2', model, history2)
     
     # Save final model
-    model.save(os.path.join(MODEL_DIR, 'final_transfer_model.keras'))
+    if strategy is None or is_chief(strategy):
+        model.save(os.path.join(MODEL_DIR, 'final_transfer_model.keras'))
     
     # Combine histories
     history = {}
@@ -112,31 +425,3 @@ def train_transfer_learning_model(model, base_model, train_generator, validation
         history[k] = history1.history[k] + history2.history[k]
     
     return history
-
-def plot_training_history(history, model_name="model"):
-    """Plot training history for accuracy and loss."""
-    # Accuracy plot
-    plt.figure(figsize=(12, 5))
-    
-    plt.subplot(1, 2, 1)
-    plt.plot(history['accuracy'], label='Training Accuracy')
-    plt.plot(history['val_accuracy'], label='Validation Accuracy')
-    plt.title(f'{model_name} - Accuracy')
-    plt.xlabel('Epoch')
-    plt.ylabel('Accuracy')
-    plt.legend()
-    plt.grid(True)
-    
-    # Loss plot
-    plt.subplot(1, 2, 2)
-    plt.plot(history['loss'], label='Training Loss')
-    plt.plot(history['val_loss'], label='Validation Loss')
-    plt.title(f'{model_name} - Loss')
-    plt.xlabel('Epoch')
-    plt.ylabel('Loss')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_DIR, f'{model_name}_history.png'))
-    plt.close()